@@ -14,11 +14,103 @@ Interval to (try to) refresh the scores in seconds.
 """
 REFRESH_INTERVAL_S = 10
 
+"""
+Follow the game's round clock instead of polling every REFRESH_INTERVAL_S.
+
+Once the round length (from the round timestamps) and the moment a round
+changes are known, polls wait mid-round, for at most REFRESH_MAX_INTERVAL_S,
+until REFRESH_BOUNDARY_WINDOW_S before the next round is expected and then
+poll every REFRESH_MIN_INTERVAL_S until it shows up. Failed requests are
+retried after REFRESH_MIN_INTERVAL_S, doubling up to REFRESH_MAX_BACKOFF_S.
+"""
+REFRESH_ADAPTIVE = True
+REFRESH_MIN_INTERVAL_S = 1
+REFRESH_MAX_INTERVAL_S = 60
+REFRESH_BOUNDARY_WINDOW_S = 5
+REFRESH_MAX_BACKOFF_S = 60
+
+"""
+Timeouts in seconds for connecting to and reading from the scoreboard.
+"""
+HTTP_CONNECT_TIMEOUT_S = 5
+HTTP_READ_TIMEOUT_S = 10
+
+"""
+How many times a failed request is retried within one refresh, and
+the initial delay in seconds between attempts (doubled every retry).
+"""
+HTTP_RETRIES = 2
+HTTP_RETRY_BACKOFF_S = 0.5
+
+"""
+Parse the scoreboard while it downloads, keeping only what we store (the
+latest label, every team's latest score and the services of the teams we
+track) instead of loading the whole document, with every team's full
+history, first. Polls that may follow missed rounds keep the full history
+for BACKFILL_MISSED_ROUNDS.
+"""
+STREAMING_PARSE = True
+
+"""
+Store our score and position in rounds we missed, e.g. while the dashboard
+was down, from the score history every scoreboard response carries. Their
+services' scores aren't in there, so those stay missing. That history is
+only parsed when rounds may have been missed: on the first poll after
+startup, after a failed poll, or when a whole round passed since the last
+poll that got an answer.
+"""
+BACKFILL_MISSED_ROUNDS = True
+
 """
 The team we are in
 """
 ME_TEAM = "xren"
 
+"""
+Other teams whose service statuses and scores are stored too, from the
+same scoreboard download, e.g. ["team-a", "team-b"]. "*" stores every team
+on the scoreboard. The dashboard still shows ME_TEAM.
+"""
+TRACKED_TEAMS = []
+
+"""
+Several scoreboards in one dashboard, e.g. the live game and a practice
+server, each in its own tab ("n" shows the next one). Every entry is a dict
+with a "name", the "url" to GET and our "team" on it, and optionally the
+"db_path" to store it in (db/<name>.sqlite3 by default) and "dev_server":
+True for a development server (see DEV_SERVER_MODE). Empty watches
+SCOREBOARD_URL for ME_TEAM in DB_FILENAME.
+
+All scoreboards are fetched at the same time, over at most
+HTTP_MAX_CONNECTIONS connections, and stored one after the other by the
+same database thread. A --collector only sends the first one to viewers.
+"""
+SCOREBOARDS = []
+HTTP_MAX_CONNECTIONS = 4
+
+"""
+One download for the whole team: a dashboard started with --collector
+also sends everything it shows to the dashboards started with
+--viewer HOST[:PORT], which don't contact the scoreboard or keep a
+database themselves. The collector listens on BROADCAST_HOST, port
+BROADCAST_PORT. Viewers retry a lost collector, waiting up to
+BROADCAST_RECONNECT_MAX_S between attempts.
+
+Only viewers on the same machine can connect by default. For teammates on
+the LAN, set BROADCAST_HOST to the collector's address on that network, or
+"0.0.0.0" for every interface. Anyone who can reach the port can then read
+the scores, so don't do that on the CTF network itself.
+"""
+BROADCAST_HOST = "127.0.0.1"
+BROADCAST_PORT = 8765
+BROADCAST_RECONNECT_MAX_S = 30
+
+"""
+The leaderboard (key "l") shows how many places every team climbed or
+dropped over this many rounds.
+"""
+LEADERBOARD_RANK_DELTA_ROUNDS = 10
+
 """
 Filename to use for the database (sqlite). This will be stored in ./db.
 
@@ -27,6 +119,105 @@ at startup!
 """
 DB_FILENAME = "scores.sqlite3"
 
+"""
+The last dashboard snapshot is stored for the next start every this many
+new rounds, and when the dashboard exits. Storing it every round would add
+a second commit to every round.
+"""
+SNAPSHOT_CACHE_ROUNDS = 10
+
+"""
+SQLite tuning, applied to every database connection as PRAGMAs.
+
+"safe" is SQLite's default: a rollback journal, synced to disk on every
+commit, during which the dashboard queries have to wait.
+"fast" writes to a write-ahead log, so the dashboard queries never wait
+for an ingest, and only syncs at checkpoints: a power cut may lose the
+last round, but never corrupts the database. It also keeps more of the
+database in (memory-mapped) memory.
+"""
+STORAGE_PROFILE = "fast"
+STORAGE_PROFILES = {
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16 * 1024,  # Negative means KiB instead of pages
+        "temp_store": "MEMORY",
+    },
+}
+
+"""
+How many prepared statements each database connection keeps around.
+"""
+STATEMENT_CACHE_SIZE = 128
+
+"""
+How the score history of every service is stored.
+
+"rows": a service_scores and a service_statuses row per service per round.
+"columnar": per service a set of arrays with one element per round (see
+models/series.py), stored a row per 64 rounds, so reading the full history
+of a service is a few contiguous reads and a round only rewrites the latest
+row of every service. SERVICE_HISTORY_ROWS keeps writing the rows as well, e.g.
+for ad hoc SQL analysis, the dashboard then only reads the arrays.
+"""
+SERVICE_HISTORY_BACKEND = "columnar"
+SERVICE_HISTORY_ROWS = True
+
+"""
+Timings, query counts and payload sizes of every update (toggle the
+panel with "m") can also be written to a file after every update.
+METRICS_FORMAT "jsonl" appends one line per update, "prometheus" keeps the
+file current in the Prometheus text format. None writes no file.
+"""
+METRICS_FILE = None
+METRICS_FORMAT = "jsonl"
+
+"""
+How many rounds of service score history the dashboard keeps and shows.
+"""
+SERVICE_HISTORY_ROUNDS = 25
+
+"""
+How far back the service sparklines go, key "z" steps through these: a
+number of rounds, or None for the whole game. However long the game, a
+sparkline gets at most one point per column (see services/downsample.py).
+With the "rows" SERVICE_HISTORY_BACKEND the whole game starts at the
+SERVICE_HISTORY_ROUNDS rounds before the dashboard was started.
+"""
+SPARKLINE_ZOOM_ROUNDS = [SERVICE_HISTORY_ROUNDS - 1, 200, None]
+
+"""
+History retention, for long games and databases that outlive a game.
+
+Service score and status rows and high scores older than the last
+RETENTION_DETAIL_ROUNDS rounds are thinned out to every
+RETENTION_DOWNSAMPLE_ROUNDS-th round. Scores are running totals, so the
+remaining rows still give correct, coarser, diffs. The columnar service
+history is small enough to always keep in full. None keeps every row.
+
+Compaction runs every RETENTION_INTERVAL_S seconds on the database worker
+and handles at most RETENTION_BATCH_ROUNDS rounds per run, then returns at
+most RETENTION_VACUUM_PAGES free pages to the file system.
+"""
+RETENTION_DETAIL_ROUNDS = 200
+RETENTION_DOWNSAMPLE_ROUNDS = 10
+RETENTION_INTERVAL_S = 60
+RETENTION_BATCH_ROUNDS = 50
+RETENTION_VACUUM_PAGES = 256
+
+"""
+Where a stored game is copied before the database is emptied for the next
+one. Only happens when the dashboard is started with --archive, never on
+its own, so a restart in the middle of a game keeps everything stored.
+"""
+ARCHIVE_DIR = "db/archive"
+
 """
 How many rounds to measure score trends for coloring the
 service-score digits.
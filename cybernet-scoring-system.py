@@ -1,23 +1,43 @@
-from sqlalchemy import create_engine
+import argparse
+import asyncio
+import math
+import time
+from typing import TYPE_CHECKING
+
+from textual import log
 from textual.app import App
 from textual.app import ComposeResult
-from textual.reactive import reactive
-from textual.widgets import Header, Footer
+from textual.timer import Timer
+from textual.widgets import Header, Footer, TabbedContent, TabPane
+
+from config.settings import SCOREBOARD_URL, REFRESH_INTERVAL_S, NUM_SAMPLES, DEV_SERVER_MODE, DB_FILENAME, RETENTION_INTERVAL_S, METRICS_FILE, METRICS_FORMAT, BROADCAST_HOST, BROADCAST_PORT, SPARKLINE_ZOOM_ROUNDS, ME_TEAM, SCOREBOARDS, HTTP_MAX_CONNECTIONS
+from services.broadcast import SnapshotBroadcaster, receive_snapshots
+from services.db_worker import DatabaseWorker
+from services.loop_lag import LoopLagMonitor
+from services.metrics import export_metrics, metrics
+from services.monitored_scoreboard import MonitoredScoreboard
+from services.snapshot_cache import read_cached_snapshot
+from services.trends import add_trend_classes
+from widgets.dashboard import Dashboard
+from widgets.leaderboard_panel import LeaderboardPanel
+from widgets.metrics_panel import MetricsPanel
 
-from config.settings import SCOREBOARD_URL, REFRESH_INTERVAL_S, NUM_SAMPLES, DEV_SERVER_MODE, DB_FILENAME
-from models.scores import Base
-from services.score_store import ScoreStoreService
-from services.stats_retriever import StatsRetriever
-from widgets.service_row import ServiceRow
-from widgets.top_row import TopRow
+# SQLAlchemy and httpx take longer to import than everything above
+# together, they're imported on the database worker after the first frame
+if TYPE_CHECKING:
+    import httpx
+
+    from services.dashboard_model import DashboardModel
 
 
 class CybernetScoringSystem(App):
     CSS_PATH = "style/css.tcss"
-
-    round_num = reactive(0, recompose=True)
-    current_score = reactive({}, recompose=True)
-    service_updates = reactive({}, recompose=True)
+    BINDINGS = [
+        ("l", "toggle_leaderboard", "Leaderboard"),
+        ("m", "toggle_metrics", "Metrics"),
+        ("z", "zoom_sparklines", "Zoom"),
+        ("n", "next_scoreboard", "Next scoreboard"),
+    ]
 
     def __init__(
         self,
@@ -25,73 +45,334 @@ class CybernetScoringSystem(App):
         refresh_interval: int,
         counter: bool = False,
         num_samples: int = 0,
+        db_path: str = f"db/{DB_FILENAME}",
+        broadcast: tuple[str, int] | None = None,
+        viewer: tuple[str, int] | None = None,
+        scoreboards: list[dict] | None = None,
+        archive: bool = False,
         *args,
         **kwargs,
     ):
-        self.url = url
+        """
+        Args:
+            url: Scoreboard to watch, unless scoreboards.
+            counter: url is a development server, see MonitoredScoreboard.
+            db_path: Database file of url.
+            broadcast: (host, port) to send every snapshot to viewers on.
+            viewer: (host, port) of a collector to show the snapshots of,
+                instead of fetching and storing the scores.
+            scoreboards: Several scoreboards to watch, in the format of
+                SCOREBOARDS.
+            archive: Archive the game stored of every scoreboard before
+                fetching, for the start of a new game.
+        """
         self.refresh_interval = refresh_interval
-        self._index_counter = 1
-        self._counter = counter
-        self._num_samples = num_samples
-        self._engine = create_engine(f"sqlite:///db/{DB_FILENAME}", echo=False)
-        if DEV_SERVER_MODE:
-            Base.metadata.drop_all(bind=self._engine)
-        Base.metadata.create_all(bind=self._engine)
-        self._score_store = ScoreStoreService(self._engine)
-        self._stats_retriever = StatsRetriever(self._engine)
+        if scoreboards:
+            self._scoreboards = [
+                MonitoredScoreboard.from_settings(entry, refresh_interval)
+                for entry in scoreboards
+            ]
+        else:
+            self._scoreboards = [
+                MonitoredScoreboard(
+                    "default",
+                    url,
+                    ME_TEAM,
+                    db_path,
+                    refresh_interval,
+                    counter=counter,
+                    num_samples=num_samples,
+                )
+            ]
+        self._db_worker = DatabaseWorker()
+        # Shared by all scoreboards, created on the database worker
+        self._client: "httpx.AsyncClient | None" = None
+        # Per scoreboard, set up by compose
+        self._dashboards: dict[str, Dashboard] = {}
+        self._loop_lag = LoopLagMonitor()
+        # Index into SPARKLINE_ZOOM_ROUNDS
+        self._zoom = 0
+        self._poll_timer: Timer | None = None
+        self._broadcast = broadcast
+        self._broadcaster: SnapshotBroadcaster | None = None
+        self._viewer = viewer
+        self._archive = archive
 
         super().__init__(*args, **kwargs)
 
-    def _toggle_update_warning(self):
-        self.query_one(Header).toggle_class("updateWarning")
-        self.query_one(Footer).toggle_class("updateWarning")
+    def _open_database(self, scoreboard: MonitoredScoreboard) -> "DashboardModel":
+        """Runs on the database worker, see MonitoredScoreboard.open."""
+        if self._client is None:
+            from services.score_store import create_http_client
+
+            self._client = create_http_client(HTTP_MAX_CONNECTIONS)
+        return scoreboard.open(self._db_worker, self._client, archive=self._archive)
 
-    async def _update_scores(self):
-        if self._counter:
-            updated = await self._score_store.get_scores(
-                f"{self.url}/{self._num_samples}/{self._index_counter}"
+    async def _ensure_database(self, scoreboard: MonitoredScoreboard) -> None:
+        if scoreboard.backend is None:
+            scoreboard.backend = asyncio.create_task(
+                self._db_worker.run(self._open_database, scoreboard)
             )
-            self._index_counter += 1
-        else:
-            updated = await self._score_store.get_scores(self.url)
+        if scoreboard.dashboard is None:
+            scoreboard.dashboard = await scoreboard.backend
+            # What's stored may differ from the cached snapshot
+            await self._show_stored_scores(scoreboard)
 
-        if not updated:
-            return
+    def _get_service_updates(self, scoreboard: MonitoredScoreboard) -> dict:
+        # No sparkline is wider than the screen
+        width = self._dashboards[scoreboard.name].sparkline_width
+        return add_trend_classes(
+            scoreboard.dashboard.get_service_updates_dict(
+                SPARKLINE_ZOOM_ROUNDS[self._zoom], width or self.size.width
+            )
+        )
 
-        cur_score, cur_pos, cur_sla = (
-            self._stats_retriever.get_current_score_position_sla()
+    async def _show_stored_scores(self, scoreboard: MonitoredScoreboard) -> None:
+        snapshot = await self._db_worker.run(
+            scoreboard.read_snapshot, self._get_service_updates(scoreboard)
         )
-        self.title = f"Cybernet Scoring System | {self._stats_retriever.get_team_name()} | Round #{self._stats_retriever.get_current_round_number()} | SLA: {cur_sla}"
-        self.current_score = {
-            "score": cur_score,
-            "position": cur_pos,
-        }
-        self.current_score = self.current_score
-        self.service_updates = self._stats_retriever.get_service_updates_dict()
-        self.service_updates = self.service_updates
+        self._show_snapshot(snapshot, scoreboard)
+
+    def _show_snapshot(self, snapshot: dict, scoreboard: MonitoredScoreboard) -> None:
+        if self._broadcaster is not None and scoreboard is self._scoreboards[0]:
+            self._broadcaster.publish(snapshot)
+        dashboard = self._dashboards[scoreboard.name]
+        dashboard.show_snapshot(snapshot)
+        if dashboard is self._active_dashboard():
+            self.title = dashboard.title
+
+    def _active_dashboard(self) -> Dashboard:
+        if len(self._scoreboards) == 1:
+            return self._dashboards[self._scoreboards[0].name]
+        return self.query_one(TabbedContent).active_pane.query_one(Dashboard)
 
+    async def _compact_history(self) -> None:
+        for scoreboard in self._scoreboards:
+            if scoreboard.dashboard is None:
+                # Wait for a possible archive of the previous game
+                continue
+            await self._db_worker.run(scoreboard.retention.compact_step)
+
+    def _toggle_update_warning(self):
+        # query() rather than query_one(): the timer may fire during shutdown
+        self.query(Header).toggle_class("updateWarning")
+        self.query(Footer).toggle_class("updateWarning")
+
+    def _flash_update_warning(self) -> None:
         self.set_timer(0.1, self._toggle_update_warning)
         self.set_timer(5, self._toggle_update_warning)
 
+    def check_action(self, action: str, parameters: tuple) -> bool | None:
+        if action == "next_scoreboard":
+            return len(self._scoreboards) > 1
+        return True
+
+    def action_toggle_leaderboard(self) -> None:
+        self._active_dashboard().query_one(LeaderboardPanel).toggle()
+
+    def action_toggle_metrics(self) -> None:
+        self.query_one(MetricsPanel).toggle()
+
+    def action_zoom_sparklines(self) -> None:
+        if self._viewer is not None:
+            # A viewer shows the sparklines the collector sends
+            return
+        self._zoom = (self._zoom + 1) % len(SPARKLINE_ZOOM_ROUNDS)
+        rounds = SPARKLINE_ZOOM_ROUNDS[self._zoom]
+        self.sub_title = "whole game" if rounds is None else f"last {rounds} rounds"
+        for scoreboard in self._scoreboards:
+            if scoreboard.dashboard is not None:
+                self._dashboards[scoreboard.name].service_updates = (
+                    self._get_service_updates(scoreboard)
+                )
+
+    def action_next_scoreboard(self) -> None:
+        tabbed_content = self.query_one(TabbedContent)
+        panes = [pane.id for pane in tabbed_content.query(TabPane)]
+        index = panes.index(tabbed_content.active)
+        tabbed_content.active = panes[(index + 1) % len(panes)]
+
+    def on_tabbed_content_tab_activated(self, _event: TabbedContent.TabActivated) -> None:
+        self.title = self._active_dashboard().title
+
+    def _poll_scores(self) -> None:
+        """Update the scoreboards that are due, all at once. Each schedules
+        its next update on its own round clock once done, so its updates
+        never overlap and a slow scoreboard doesn't hold up the others."""
+        now = time.monotonic()
+        due = [
+            scoreboard
+            for scoreboard in self._scoreboards
+            if scoreboard.next_poll <= now
+        ]
+        for scoreboard in due:
+            # Until it's done
+            scoreboard.next_poll = math.inf
+        if due:
+            self.run_worker(
+                asyncio.gather(*(self._poll_scoreboard(scoreboard) for scoreboard in due))
+            )
+        self._schedule_poll()
+
+    async def _poll_scoreboard(self, scoreboard: MonitoredScoreboard) -> None:
+        try:
+            await self._update_scores([scoreboard])
+        finally:
+            scoreboard.schedule()
+            self._schedule_poll()
+
+    def _schedule_poll(self) -> None:
+        if self._poll_timer is not None:
+            self._poll_timer.stop()
+        next_poll = min(scoreboard.next_poll for scoreboard in self._scoreboards)
+        self._poll_timer = (
+            None
+            if next_poll == math.inf
+            else self.set_timer(max(next_poll - time.monotonic(), 0), self._poll_scores)
+        )
+
+    async def _update_scores(
+        self, scoreboards: list[MonitoredScoreboard] | None = None
+    ) -> None:
+        """Fetch and show scoreboards concurrently, all of them by default."""
+        scoreboards = scoreboards or self._scoreboards
+        if len(scoreboards) == 1:
+            # Without a task around it, the update is done before the next
+            # frame, as the replay benchmark expects
+            await self._update_scoreboard(scoreboards[0])
+            return
+        await asyncio.gather(
+            *(self._update_scoreboard(scoreboard) for scoreboard in scoreboards)
+        )
+
+    async def _update_scoreboard(self, scoreboard: MonitoredScoreboard) -> None:
+        if scoreboard.updating:
+            return
+        scoreboard.updating = True
+        try:
+            await self._fetch_and_show_scores(scoreboard)
+        finally:
+            scoreboard.updating = False
+
+    async def _fetch_and_show_scores(self, scoreboard: MonitoredScoreboard) -> None:
+        self._loop_lag.reset()
+        start = time.perf_counter()
+        queries = metrics.counter("db.queries")
+        await self._ensure_database(scoreboard)
+        if not await scoreboard.fetch():
+            return
+
+        await self._show_stored_scores(scoreboard)
+        self.call_after_refresh(self._frame_painted, time.perf_counter())
+        metrics.observe("update.total_ms", (time.perf_counter() - start) * 1000)
+        metrics.observe("update.queries", metrics.counter("db.queries") - queries)
+        loop_lag = self._loop_lag.reset() * 1000
+        metrics.observe("update.loop_lag_ms", loop_lag)
+        log.info(f"Max event loop lag during update: {loop_lag:.1f} ms")
+
+        if self._dashboards[scoreboard.name] is self._active_dashboard():
+            self._flash_update_warning()
+
+    async def _follow_collector(self) -> None:
+        """Show what the collector sends, as a viewer."""
+        round_number = None
+        async for sent, snapshot in receive_snapshots(*self._viewer):
+            # Includes how old the snapshot was when we (re)connected
+            metrics.observe("viewer.snapshot_age_ms", (time.time() - sent) * 1000)
+            self._show_snapshot(snapshot, self._scoreboards[0])
+            if round_number is not None and snapshot["round"] != round_number:
+                self._flash_update_warning()
+            round_number = snapshot["round"]
+
+    def _frame_painted(self, updated: float) -> None:
+        metrics.observe("render.frame_ms", (time.perf_counter() - updated) * 1000)
+        if METRICS_FILE is not None:
+            export_metrics(METRICS_FILE, METRICS_FORMAT)
+
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True, icon="⛊")
-        yield TopRow().data_bind(current_score=CybernetScoringSystem.current_score)
-        for service_name in self.service_updates:
-            yield ServiceRow(service_name).data_bind(
-                service_updates=CybernetScoringSystem.service_updates
-            )
+        if len(self._scoreboards) == 1:
+            dashboard = Dashboard()
+            self._dashboards[self._scoreboards[0].name] = dashboard
+            yield dashboard
+        else:
+            with TabbedContent():
+                for index, scoreboard in enumerate(self._scoreboards):
+                    dashboard = Dashboard(scoreboard.name)
+                    self._dashboards[scoreboard.name] = dashboard
+                    with TabPane(scoreboard.name, id=f"scoreboard-{index}"):
+                        yield dashboard
+        yield MetricsPanel()
         yield Footer()
 
-    def on_mount(self) -> None:
-        self.set_timer(0.1, self._update_scores)
-        self.set_interval(self.refresh_interval, self._update_scores)
+    async def on_mount(self) -> None:
+        self.set_interval(self._loop_lag.interval, self._loop_lag.tick)
+        if self._viewer is not None:
+            self.run_worker(self._follow_collector(), exclusive=True)
+            return
+        if self._broadcast is not None:
+            self._broadcaster = SnapshotBroadcaster()
+            await self._broadcaster.start(*self._broadcast)
+        # Paint what was shown last time, then catch up in the background
+        for scoreboard in self._scoreboards:
+            if scoreboard.counter:
+                continue
+            snapshot = read_cached_snapshot(scoreboard.db_path)
+            if snapshot is not None:
+                self._show_snapshot(snapshot, scoreboard)
+        self.call_after_refresh(self._poll_scores)
+        self.set_interval(RETENTION_INTERVAL_S, self._compact_history)
+
+    async def on_unmount(self) -> None:
+        if self._broadcaster is not None:
+            await self._broadcaster.close()
+        for scoreboard in self._scoreboards:
+            if scoreboard.dashboard is not None:
+                await self._db_worker.run(scoreboard.cache_snapshot)
+            await scoreboard.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+        self._db_worker.shutdown()
+
+
+def _parse_address(address: str) -> tuple[str, int]:
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, BROADCAST_PORT
+    return host, int(port)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cybernet Scoring System")
+    parser.add_argument(
+        "--collector",
+        action="store_true",
+        help=f"Send the scores to viewers on {BROADCAST_HOST}:{BROADCAST_PORT}",
+    )
+    parser.add_argument(
+        "--viewer",
+        metavar="HOST[:PORT]",
+        type=_parse_address,
+        help="Show the scores of a collector instead of fetching them",
+    )
+    parser.add_argument(
+        "--headless", action="store_true", help="No UI, e.g. for a collector"
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Archive the stored game into ARCHIVE_DIR and start empty, "
+        "for a new game",
+    )
+    args = parser.parse_args()
     app = CybernetScoringSystem(
         url=SCOREBOARD_URL,
         refresh_interval=REFRESH_INTERVAL_S,
         num_samples=NUM_SAMPLES,
         counter=DEV_SERVER_MODE,
+        scoreboards=SCOREBOARDS,
+        broadcast=(BROADCAST_HOST, BROADCAST_PORT) if args.collector else None,
+        viewer=args.viewer,
+        archive=args.archive,
     )
-    app.run()
+    app.run(headless=args.headless)
@@ -0,0 +1,44 @@
+import time
+
+from sqlalchemy import Engine, create_engine, event
+
+from config.settings import STORAGE_PROFILE, STORAGE_PROFILES, STATEMENT_CACHE_SIZE
+from services.metrics import metrics
+
+
+def create_db_engine(path: str, profile: str = STORAGE_PROFILE) -> Engine:
+    """Engine for the SQLite database at path, tuned by a storage profile.
+
+    Args:
+        path: Path of the database file.
+        profile: Key of STORAGE_PROFILES with the PRAGMAs to apply.
+    """
+    pragmas = STORAGE_PROFILES[profile]
+    engine = create_engine(
+        f"sqlite:///{path}",
+        echo=False,
+        connect_args={"cached_statements": STATEMENT_CACHE_SIZE},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, _connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        # Lets retention hand freed pages back bit by bit. Only has an
+        # effect on new databases, or after a full VACUUM.
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_query(_connection, _cursor, _statement, _parameters, context, _many):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _count_query(_connection, _cursor, _statement, _parameters, context, _many):
+        metrics.increment("db.queries")
+        metrics.observe(
+            "db.query_ms", (time.perf_counter() - context._query_start) * 1000
+        )
+
+    return engine
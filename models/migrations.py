@@ -0,0 +1,251 @@
+"""
+Versioned in-place upgrades of existing databases.
+
+The schema version is stored in SQLite's user_version. A new database is
+created at the latest version straight from the models. An existing one
+runs every migration it hasn't seen yet, in order, at startup.
+
+To change the schema: update the models, then append a migration that
+brings an existing database to the same state. Migrations spell out their
+DDL instead of using the models, which only describe the latest version.
+"""
+
+from typing import Callable
+
+from sqlalchemy import Connection, Engine, inspect
+
+from config.settings import ME_TEAM
+from models.scores import Base, GameRound
+from models.series import PackedSeries, ServiceSeries, TeamSeries
+
+
+def _add_indexes(connection: Connection) -> None:
+    # Original code never stored a service name twice, but make sure
+    # before adding the unique index.
+    for table in ("service_scores", "service_statuses"):
+        connection.exec_driver_sql(
+            f"UPDATE {table} SET service_id = (SELECT MIN(other.id) "
+            "FROM services AS own JOIN services AS other ON other.name = own.name "
+            f"WHERE own.id = {table}.service_id)"
+        )
+    connection.exec_driver_sql(
+        "DELETE FROM services WHERE id NOT IN "
+        "(SELECT MIN(id) FROM services GROUP BY name)"
+    )
+    for statement in (
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_rounds_score_timestamp "
+        "ON rounds (score_timestamp)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_services_name ON services (name)",
+        "CREATE INDEX IF NOT EXISTS ix_high_scores_game_round_id "
+        "ON high_scores (game_round_id)",
+        "CREATE INDEX IF NOT EXISTS ix_service_scores_round_service "
+        "ON service_scores (game_round_id, service_id)",
+        "CREATE INDEX IF NOT EXISTS ix_service_scores_service_round "
+        "ON service_scores (service_id, game_round_id)",
+        "CREATE INDEX IF NOT EXISTS ix_service_statuses_round "
+        "ON service_statuses (game_round_id)",
+        "CREATE INDEX IF NOT EXISTS ix_service_statuses_service_round "
+        "ON service_statuses (service_id, game_round_id)",
+    ):
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("ANALYZE")
+
+
+def _add_service_history(connection: Connection) -> None:
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS service_history ("
+        "service_id INTEGER NOT NULL PRIMARY KEY REFERENCES services (id), "
+        "first_round_id INTEGER NOT NULL, offense BLOB NOT NULL, "
+        "defence BLOB NOT NULL, status BLOB NOT NULL)"
+    )
+    all_series: dict[int, ServiceSeries] = {}
+    for service_id, round_id, offense, defence, status in connection.exec_driver_sql(
+        "SELECT service_scores.service_id, service_scores.game_round_id, "
+        "service_scores.offense_total, service_scores.defence_total, "
+        "service_statuses.status FROM service_scores "
+        "LEFT JOIN service_statuses "
+        "ON service_statuses.service_id = service_scores.service_id "
+        "AND service_statuses.game_round_id = service_scores.game_round_id "
+        "ORDER BY service_scores.service_id, service_scores.game_round_id"
+    ):
+        if service_id not in all_series:
+            all_series[service_id] = ServiceSeries(round_id)
+        all_series[service_id].set(round_id, offense, defence, status)
+    if all_series:
+        connection.exec_driver_sql(
+            "INSERT INTO service_history "
+            "(service_id, first_round_id, offense, defence, status) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (service_id, *series.to_blobs().values())
+                for service_id, series in all_series.items()
+            ],
+        )
+
+
+def _add_teams(connection: Connection) -> None:
+    # Everything stored so far belongs to the team the dashboard was run for
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS teams ("
+        "id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL)"
+    )
+    connection.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_teams_name ON teams (name)"
+    )
+    me_team = connection.exec_driver_sql(
+        "SELECT me_team FROM high_scores ORDER BY id DESC LIMIT 1"
+    ).scalar()
+    team_id = connection.exec_driver_sql(
+        "INSERT INTO teams (name) VALUES (?) RETURNING id", (me_team or ME_TEAM,)
+    ).scalar_one()
+
+    for table in ("service_statuses", "service_scores"):
+        connection.exec_driver_sql(
+            f"ALTER TABLE {table} ADD COLUMN team_id INTEGER REFERENCES teams (id)"
+        )
+        connection.exec_driver_sql(f"UPDATE {table} SET team_id = ?", (team_id,))
+    for statement in (
+        "DROP INDEX IF EXISTS ix_service_scores_round_service",
+        "DROP INDEX IF EXISTS ix_service_scores_service_round",
+        "DROP INDEX IF EXISTS ix_service_statuses_round",
+        "DROP INDEX IF EXISTS ix_service_statuses_service_round",
+        "CREATE INDEX ix_service_scores_team_round_service "
+        "ON service_scores (team_id, game_round_id, service_id)",
+        "CREATE INDEX ix_service_scores_team_service_round "
+        "ON service_scores (team_id, service_id, game_round_id)",
+        "CREATE INDEX ix_service_statuses_team_round "
+        "ON service_statuses (team_id, game_round_id)",
+        "CREATE INDEX ix_service_statuses_team_service_round "
+        "ON service_statuses (team_id, service_id, game_round_id)",
+        # The primary key changes, so the table has to be rebuilt
+        "ALTER TABLE service_history RENAME TO service_history_old",
+        "CREATE TABLE service_history ("
+        "team_id INTEGER NOT NULL REFERENCES teams (id), "
+        "service_id INTEGER NOT NULL REFERENCES services (id), "
+        "first_round_id INTEGER NOT NULL, offense BLOB NOT NULL, "
+        "defence BLOB NOT NULL, status BLOB NOT NULL, "
+        "PRIMARY KEY (team_id, service_id))",
+    ):
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(
+        "INSERT INTO service_history "
+        "SELECT ?, service_id, first_round_id, offense, defence, status "
+        "FROM service_history_old",
+        (team_id,),
+    )
+    connection.exec_driver_sql("DROP TABLE service_history_old")
+    connection.exec_driver_sql("ANALYZE")
+
+
+def _add_dashboard_snapshot(connection: Connection) -> None:
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS dashboard_snapshot ("
+        "id INTEGER NOT NULL PRIMARY KEY, data VARCHAR NOT NULL)"
+    )
+
+
+def _add_team_history(connection: Connection) -> None:
+    # Starts empty: only our own score and position were stored before
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS team_history ("
+        "team_id INTEGER NOT NULL PRIMARY KEY REFERENCES teams (id), "
+        "first_round_id INTEGER NOT NULL, score BLOB NOT NULL, rank BLOB NOT NULL)"
+    )
+
+
+def _split_into_chunks(
+    connection: Connection,
+    table: str,
+    keys: list[str],
+    series_class: type[PackedSeries],
+    create_table: str,
+) -> None:
+    """Rebuild a table of whole-game series blobs with a row per chunk."""
+    connection.exec_driver_sql(f"ALTER TABLE {table} RENAME TO {table}_old")
+    connection.exec_driver_sql(create_table)
+    blobs = ["first_round_id", *(name for name, _, _ in series_class.COLUMNS)]
+    rows = []
+    for row in connection.exec_driver_sql(
+        f"SELECT {', '.join(keys + blobs)} FROM {table}_old"
+    ):
+        rows.extend(
+            (*row[: len(keys)], chunk, *series.to_blobs().values())
+            for chunk, series in series_class.from_blobs(*row[len(keys) :]).chunks()
+        )
+    if rows:
+        columns = [*keys, "chunk", *blobs]
+        connection.exec_driver_sql(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            rows,
+        )
+    connection.exec_driver_sql(f"DROP TABLE {table}_old")
+
+
+def _chunk_service_history(connection: Connection) -> None:
+    # A row per chunk of a series instead of one for the whole game
+    _split_into_chunks(
+        connection,
+        "service_history",
+        ["team_id", "service_id"],
+        ServiceSeries,
+        "CREATE TABLE service_history ("
+        "team_id INTEGER NOT NULL REFERENCES teams (id), "
+        "service_id INTEGER NOT NULL REFERENCES services (id), "
+        "chunk INTEGER NOT NULL, first_round_id INTEGER NOT NULL, "
+        "offense BLOB NOT NULL, defence BLOB NOT NULL, status BLOB NOT NULL, "
+        "PRIMARY KEY (team_id, service_id, chunk))",
+    )
+
+
+def _chunk_team_history(connection: Connection) -> None:
+    _split_into_chunks(
+        connection,
+        "team_history",
+        ["team_id"],
+        TeamSeries,
+        "CREATE TABLE team_history ("
+        "team_id INTEGER NOT NULL REFERENCES teams (id), "
+        "chunk INTEGER NOT NULL, first_round_id INTEGER NOT NULL, "
+        "score BLOB NOT NULL, rank BLOB NOT NULL, "
+        "PRIMARY KEY (team_id, chunk))",
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX ix_team_history_chunk ON team_history (chunk)"
+    )
+
+
+# MIGRATIONS[n] upgrades a database from version n to version n + 1
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _add_indexes,
+    _add_service_history,
+    _add_teams,
+    _add_dashboard_snapshot,
+    _add_team_history,
+    _chunk_service_history,
+    _chunk_team_history,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(connection: Connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def prepare_database(engine: Engine, reset: bool = False) -> None:
+    """Create a fresh database or upgrade an existing one to SCHEMA_VERSION.
+
+    Args:
+        engine: Engine of the database.
+        reset: Drop all data first.
+    """
+    if reset:
+        Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        is_new = not inspect(connection).has_table(GameRound.__tablename__)
+        version = SCHEMA_VERSION if is_new else get_schema_version(connection)
+        for migration in MIGRATIONS[version:]:
+            migration(connection)
+        # New tables from the models; existing ones were migrated above
+        Base.metadata.create_all(bind=connection)
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
@@ -1,7 +1,7 @@
 import datetime
 from typing import List
 
-from sqlalchemy import ForeignKey, func, DateTime
+from sqlalchemy import ForeignKey, func, DateTime, Index, LargeBinary
 from sqlalchemy.orm import DeclarativeBase, mapped_column, Mapped, relationship
 
 
@@ -12,20 +12,26 @@ class Base(DeclarativeBase):
 class Service(Base):
     __tablename__ = "services"
     id: Mapped[int] = mapped_column(primary_key=True)
-    name: Mapped[str]
+    name: Mapped[str] = mapped_column(unique=True, index=True)
     scores: Mapped[List["ServiceScore"]] = relationship(back_populates="service")
     service_statuses: Mapped[List["ServiceStatus"]] = relationship(
         back_populates="service"
     )
 
 
+class Team(Base):
+    __tablename__ = "teams"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(unique=True, index=True)
+
+
 class GameRound(Base):
     __tablename__ = "rounds"
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp_utc: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now(), nullable=False
     )
-    score_timestamp: Mapped[str] = mapped_column()
+    score_timestamp: Mapped[str] = mapped_column(unique=True, index=True)
     service_scores: Mapped[List["ServiceScore"]] = relationship(
         back_populates="game_round"
     )
@@ -40,7 +46,17 @@ class GameRound(Base):
 
 class ServiceStatus(Base):
     __tablename__ = "service_statuses"
+    __table_args__ = (
+        Index(
+            "ix_service_statuses_team_service_round",
+            "team_id",
+            "service_id",
+            "game_round_id",
+        ),
+        Index("ix_service_statuses_team_round", "team_id", "game_round_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
+    team_id: Mapped[int] = mapped_column(ForeignKey("teams.id"))
     service_id: Mapped[int] = mapped_column(ForeignKey("services.id"))
     service: Mapped[Service] = relationship(back_populates="service_statuses")
     game_round_id: Mapped[int] = mapped_column(ForeignKey("rounds.id"))
@@ -50,7 +66,22 @@ class ServiceStatus(Base):
 
 class ServiceScore(Base):
     __tablename__ = "service_scores"
+    __table_args__ = (
+        Index(
+            "ix_service_scores_team_round_service",
+            "team_id",
+            "game_round_id",
+            "service_id",
+        ),
+        Index(
+            "ix_service_scores_team_service_round",
+            "team_id",
+            "service_id",
+            "game_round_id",
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
+    team_id: Mapped[int] = mapped_column(ForeignKey("teams.id"))
     service_id: Mapped[int] = mapped_column(ForeignKey("services.id"))
     service: Mapped[Service] = relationship(back_populates="scores")
     game_round_id: Mapped[int] = mapped_column(ForeignKey("rounds.id"))
@@ -62,10 +93,50 @@ class ServiceScore(Base):
 class HighscoreAndSLA(Base):
     __tablename__ = "high_scores"
     id: Mapped[int] = mapped_column(primary_key=True)
-    game_round_id: Mapped[int] = mapped_column(ForeignKey("rounds.id"))
+    game_round_id: Mapped[int] = mapped_column(ForeignKey("rounds.id"), index=True)
     game_round: Mapped[GameRound] = relationship(back_populates="high_scores")
     label: Mapped[str]
     score: Mapped[int]
     position: Mapped[int]
     sla: Mapped[str]
     me_team: Mapped[str]
+
+
+class ServiceHistory(Base):
+    """Score history of a team's service, as arrays packed into blobs, a row
+    per chunk of CHUNK_ROUNDS rounds.
+
+    See models/series.py for the layout."""
+
+    __tablename__ = "service_history"
+    team_id: Mapped[int] = mapped_column(ForeignKey("teams.id"), primary_key=True)
+    service_id: Mapped[int] = mapped_column(
+        ForeignKey("services.id"), primary_key=True
+    )
+    chunk: Mapped[int] = mapped_column(primary_key=True)
+    first_round_id: Mapped[int]
+    offense: Mapped[bytes] = mapped_column(LargeBinary)
+    defence: Mapped[bytes] = mapped_column(LargeBinary)
+    status: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class TeamHistory(Base):
+    """Score and rank history of every team on the scoreboard, like
+    ServiceHistory."""
+
+    __tablename__ = "team_history"
+    team_id: Mapped[int] = mapped_column(ForeignKey("teams.id"), primary_key=True)
+    # Indexed for the latest chunks of all teams, see read_leaderboard
+    chunk: Mapped[int] = mapped_column(primary_key=True, index=True)
+    first_round_id: Mapped[int]
+    score: Mapped[bytes] = mapped_column(LargeBinary)
+    rank: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class DashboardSnapshot(Base):
+    """What the dashboard showed last, as JSON, so a restart can paint it
+    straight away. Only ever holds the row with id 1."""
+
+    __tablename__ = "dashboard_snapshot"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    data: Mapped[str]
@@ -0,0 +1,163 @@
+import sys
+from array import array
+from operator import attrgetter
+from typing import Iterator
+
+# Statuses are stored as one byte per round, anything unknown as NO_STATUS
+NO_STATUS = 0
+STATUS_CODES = {"OK": 1, "FW": 2, "FF": 3, "FR": 4, "FC": 5}
+STATUSES = {code: status for status, code in STATUS_CODES.items()}
+
+# Marks a round without a score
+MISSING = -1
+
+# Rounds per stored chunk of a series, chunk n holds rounds n * CHUNK_ROUNDS
+# up to (n + 1) * CHUNK_ROUNDS - 1. Changing it needs a migration.
+CHUNK_ROUNDS = 64
+
+
+def chunk_of(round_id: int) -> int:
+    return round_id // CHUNK_ROUNDS
+
+
+def _to_bytes(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode, data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class PackedSeries:
+    """History of one thing as contiguous arrays, a column per value.
+
+    Element i holds round first_round_id + i. Rounds without values hold
+    each column's missing value, so a round's position never has to be
+    looked up. Subclasses list their COLUMNS as (name, typecode, missing
+    value), the first column tells whether a round is stored."""
+
+    COLUMNS: tuple[tuple[str, str, int], ...] = ()
+    __slots__ = ("first_round_id",)
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        # Series are decoded by the thousand, don't unpack COLUMNS every time
+        cls._typecodes = tuple(typecode for _, typecode, _ in cls.COLUMNS)
+        cls._column_getter = attrgetter(*(name for name, _, _ in cls.COLUMNS))
+
+    def __init__(self, first_round_id: int, *columns: array | None) -> None:
+        self.first_round_id = first_round_id
+        columns += (None,) * (len(self.COLUMNS) - len(columns))
+        for (name, typecode, _), values in zip(self.COLUMNS, columns):
+            setattr(self, name, values if values is not None else array(typecode))
+
+    def _columns(self) -> tuple[array, ...]:
+        return self._column_getter(self)
+
+    @property
+    def last_round_id(self) -> int:
+        return self.first_round_id + len(self._columns()[0]) - 1
+
+    def set(self, round_id: int, *values: int) -> None:
+        """Store a round, which must not be older than the ones stored before."""
+        columns = self._columns()
+        if not columns[0]:
+            self.first_round_id = round_id
+        index = round_id - self.first_round_id
+        if index < len(columns[0]):
+            for column, value in zip(columns, values):
+                column[index] = value
+            return
+        gap = index - len(columns[0])
+        for column, value, (_, _, missing) in zip(columns, values, self.COLUMNS):
+            column.extend([missing] * gap + [value])
+
+    def extend(self, later: "PackedSeries") -> None:
+        """Append a series that starts after this one ends, e.g. its next chunk."""
+        columns = self._columns()
+        if not columns[0]:
+            self.first_round_id = later.first_round_id
+        gap = later.first_round_id - self.first_round_id - len(columns[0])
+        for column, later_column, (_, _, missing) in zip(
+            columns, later._columns(), self.COLUMNS
+        ):
+            column.extend([missing] * gap)
+            column.extend(later_column)
+
+    def chunks(self) -> Iterator[tuple[int, "PackedSeries"]]:
+        """The series split into (chunk, series) as stored, see chunk_of.
+        Chunks without a stored round are left out."""
+        columns = self._columns()
+        missing = self.COLUMNS[0][2]
+        for chunk in range(chunk_of(self.first_round_id), chunk_of(self.last_round_id) + 1):
+            start = max(chunk * CHUNK_ROUNDS - self.first_round_id, 0)
+            end = min((chunk + 1) * CHUNK_ROUNDS - self.first_round_id, len(columns[0]))
+            while start < end and columns[0][start] == missing:
+                start += 1
+            if start < end:
+                yield chunk, type(self)(
+                    self.first_round_id + start,
+                    *(column[start:end] for column in columns),
+                )
+
+    def to_blobs(self) -> dict:
+        blobs = {"first_round_id": self.first_round_id}
+        for name, _, _ in self.COLUMNS:
+            blobs[name] = _to_bytes(getattr(self, name))
+        return blobs
+
+    @classmethod
+    def from_blobs(cls, first_round_id: int, *blobs: bytes) -> "PackedSeries":
+        return cls(first_round_id, *map(_from_bytes, cls._typecodes, blobs))
+
+
+class ServiceSeries(PackedSeries):
+    """Score history of one service."""
+
+    COLUMNS = (
+        ("offense", "q", MISSING),
+        ("defence", "q", MISSING),
+        ("status", "B", NO_STATUS),
+    )
+    __slots__ = ("offense", "defence", "status")
+
+    def set(self, round_id: int, offense: int, defence: int, status: str) -> None:
+        super().set(round_id, offense, defence, STATUS_CODES.get(status, NO_STATUS))
+
+    def rounds(self, after_round_id: int = 0) -> Iterator[tuple[int, int, int, str | None]]:
+        """(round_id, offense, defence, status) of the stored rounds after a round."""
+        start = max(after_round_id + 1 - self.first_round_id, 0)
+        for index in range(start, len(self.offense)):
+            if self.offense[index] != MISSING:
+                yield (
+                    self.first_round_id + index,
+                    self.offense[index],
+                    self.defence[index],
+                    STATUSES.get(self.status[index]),
+                )
+
+
+# Marks a round the team has no rank for, ranks start at 1
+NO_RANK = 0
+
+
+class TeamSeries(PackedSeries):
+    """Score and rank history of one team."""
+
+    COLUMNS = (("score", "q", MISSING), ("rank", "H", NO_RANK))
+    __slots__ = ("score", "rank")
+
+    def rank_at(self, round_id: int) -> int | None:
+        """The rank in a round, or in the latest round before it with one."""
+        index = min(round_id - self.first_round_id, len(self.rank) - 1)
+        while index >= 0:
+            if self.rank[index] != NO_RANK:
+                return self.rank[index]
+            index -= 1
+        return None
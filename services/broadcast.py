@@ -0,0 +1,115 @@
+"""
+One collector fetches and stores the scores, any number of viewers show
+what it sends them.
+
+The collector sends every dashboard snapshot to every connected viewer
+over TCP as a line of JSON, {"sent": <unix time>, "snapshot": {...}},
+encoded once however many viewers there are. A viewer that connects gets
+the latest snapshot straight away. Snapshots are complete, so a viewer
+that can't keep up just misses some.
+
+Only the standard library, so a viewer doesn't import SQLAlchemy or httpx.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+
+from textual import log
+
+from config.settings import BROADCAST_RECONNECT_MAX_S
+from services.metrics import metrics
+
+# Snapshots a stuck viewer may have queued before it's skipped
+_MAX_QUEUED_BYTES = 1024 * 1024
+# Longest line a viewer accepts
+_MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+
+class SnapshotBroadcaster:
+    def __init__(self) -> None:
+        self._server: asyncio.Server | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self._latest: bytes | None = None
+
+    async def start(self, host: str, port: int) -> None:
+        self._server = await asyncio.start_server(self._serve_viewer, host, port)
+        log.info(f"Broadcasting snapshots on {host}:{port}")
+
+    @property
+    def port(self) -> int:
+        """The port listened on, e.g. when started on port 0."""
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def viewers(self) -> int:
+        return len(self._writers)
+
+    async def _serve_viewer(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        if self._latest is not None:
+            writer.write(self._latest)
+        self._writers.add(writer)
+        metrics.increment("broadcast.connections")
+        try:
+            # Viewers never send anything: this returns when they hang up,
+            # and whatever else connected is hung up on once it sends
+            if await reader.read(1024):
+                metrics.increment("broadcast.rejected")
+                log.warning("Closed a broadcast connection that sent data")
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def publish(self, snapshot: dict) -> None:
+        """Send a snapshot to every viewer, without waiting for any of them."""
+        message = (json.dumps({"sent": time.time(), "snapshot": snapshot}) + "\n").encode()
+        self._latest = message
+        for writer in self._writers:
+            if writer.transport.get_write_buffer_size() > _MAX_QUEUED_BYTES:
+                metrics.increment("broadcast.skipped")
+                continue
+            writer.write(message)
+        metrics.observe("broadcast.bytes", len(message))
+        metrics.observe("broadcast.viewers", len(self._writers))
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in self._writers:
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+
+async def receive_snapshots(host: str, port: int) -> AsyncIterator[tuple[float, dict]]:
+    """(sent, snapshot) of every snapshot a collector sends, forever:
+    reconnects, backing off up to BROADCAST_RECONNECT_MAX_S, when the
+    collector can't be reached."""
+    delay = 1.0
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(
+                host, port, limit=_MAX_MESSAGE_BYTES
+            )
+        except OSError as e:
+            log.error(f"Failed to connect to collector: {e!r}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BROADCAST_RECONNECT_MAX_S)
+            continue
+        delay = 1.0
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                yield message["sent"], message["snapshot"]
+            log.error("Collector closed the connection")
+        except (OSError, ValueError) as e:
+            log.error(f"Lost the collector: {e!r}")
+        finally:
+            writer.close()
+        await asyncio.sleep(delay)
@@ -0,0 +1,113 @@
+from collections import deque
+
+from config.settings import SERVICE_HISTORY_ROUNDS
+from models.series import MISSING, ServiceSeries
+from services.downsample import DownsampledSeries
+
+
+class DashboardModel:
+    """In-memory copy of the recent service scores shown on the dashboard.
+
+    Every service keeps a ring buffer of (round_id, position in that
+    round, offense_total, defence_total) for the last
+    SERVICE_HISTORY_ROUNDS rounds. Ingesting a round only appends to those
+    buffers, instead of re-reading the whole window from the database on
+    every refresh.
+
+    The sparklines can also zoom out to the whole game, which every service
+    keeps as a DownsampledSeries of its offense and defence totals."""
+
+    def __init__(self, window: int = SERVICE_HISTORY_ROUNDS) -> None:
+        self._window = window
+        self._round_id = 0
+        self._scores: dict[str, deque[tuple[int, int, int, int]]] = {}
+        self._statuses: dict[str, str] = {}
+        self._history: dict[str, tuple[DownsampledSeries, DownsampledSeries]] = {}
+        self._history_round_ids: dict[str, int] = {}
+
+    def load_history(self, history: dict[str, ServiceSeries], round_id: int) -> None:
+        """Start from the full game history, instead of only the recent rounds.
+
+        Args:
+            history: Per service name its full history, see read_service_history.
+            round_id: Id of the latest round.
+        """
+        recent: dict[int, dict] = {}
+        for name, series in history.items():
+            self._history[name] = (
+                DownsampledSeries(value for value in series.offense if value != MISSING),
+                DownsampledSeries(value for value in series.defence if value != MISSING),
+            )
+            self._history_round_ids[name] = series.last_round_id
+            for service_round_id, off_total, def_total, status in series.rounds(
+                after_round_id=round_id - self._window
+            ):
+                recent.setdefault(service_round_id, {})[name] = {
+                    "status": status,
+                    "off_total": off_total,
+                    "def_total": def_total,
+                }
+        for service_round_id, services in sorted(recent.items()):
+            self.apply_round(service_round_id, services)
+
+    def apply_round(self, round_id: int, services: dict) -> None:
+        """Add one ingested round.
+
+        Args:
+            round_id: Id of the round, increasing with every round.
+            services: Per service name a dict with status, off_total and def_total.
+        """
+        self._round_id = max(self._round_id, round_id)
+        for position, (name, service) in enumerate(services.items()):
+            if name not in self._scores:
+                self._scores[name] = deque(maxlen=self._window)
+            self._scores[name].append(
+                (round_id, position, service["off_total"], service["def_total"])
+            )
+            self._statuses[name] = service["status"]
+            if round_id > self._history_round_ids.get(name, 0):
+                offense, defence = self._history.setdefault(
+                    name, (DownsampledSeries(), DownsampledSeries())
+                )
+                offense.append(service["off_total"])
+                defence.append(service["def_total"])
+                self._history_round_ids[name] = round_id
+
+    def get_service_updates_dict(
+        self, sparkline_rounds: int | None = None, width: int | None = None
+    ) -> dict:
+        """Same result as StatsRetriever.get_service_updates_dict.
+
+        Args:
+            sparkline_rounds: How many rounds off_series and def_series go
+                back, None for the whole game. Only used with a width.
+            width: At most how many points off_series and def_series have.
+                Without it they are the recent rounds as they are.
+        """
+        oldest_round_id = self._round_id - self._window
+        recent = []
+        for name, scores in self._scores.items():
+            window = [score for score in scores if score[0] > oldest_round_id]
+            if window:
+                recent.append((window[0][:2], name, window))
+        # Services are listed in the order they first show up in the window
+        recent.sort(key=lambda item: item[0])
+
+        update = {}
+        for _, name, window in recent:
+            off_series = [score[2] for score in window]
+            def_series = [score[3] for score in window]
+            update[name] = {
+                "off_series": off_series[1:],
+                "def_series": def_series[1:],
+                "off_total": off_series[-1],
+                "def_total": def_series[-1],
+                "status": self._statuses[name],
+                "off_diff": [b - a for a, b in zip(off_series, off_series[1:])],
+                "def_diff": [b - a for a, b in zip(def_series, def_series[1:])],
+            }
+            if width is not None:
+                offense, defence = self._history[name]
+                update[name]["off_series"] = offense.window(sparkline_rounds, width)
+                update[name]["def_series"] = defence.window(sparkline_rounds, width)
+        return update
@@ -0,0 +1,72 @@
+"""
+Sparkline series of any length in at most as many points as the sparkline
+is wide.
+
+A Sparkline draws the max of every stretch of its data that falls on one
+column, so it can be handed the max of every bucket of rounds instead of
+every round: the same picture, at a cost that no longer grows with the
+game.
+"""
+
+from typing import Iterable
+
+
+class DownsampledSeries:
+    """A series kept at halving resolutions.
+
+    Level k holds the max of every 2**k consecutive values, aligned to the
+    first value, so appending a value costs O(1) amortized and any window
+    can be read from the coarsest level that still has enough points."""
+
+    __slots__ = ("_levels", "_count")
+
+    def __init__(self, values: Iterable[int] = ()) -> None:
+        level = list(values)
+        self._count = len(level)
+        self._levels = [level]
+        while len(level) >= 2:
+            level = [max(a, b) for a, b in zip(level[::2], level[1::2])]
+            self._levels.append(level)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, value: int) -> None:
+        self._count += 1
+        self._levels[0].append(value)
+        level = 0
+        # Every second value on a level completes a bucket on the next
+        while len(self._levels[level]) % 2 == 0:
+            if level + 1 == len(self._levels):
+                self._levels.append([])
+            self._levels[level + 1].append(max(self._levels[level][-2:]))
+            level += 1
+
+    def window(self, rounds: int | None, width: int) -> list[int]:
+        """The last rounds values (all of them if None) in at most width points.
+
+        Returns:
+            The values themselves if they fit, otherwise the max of every
+            bucket of the smallest power of two rounds that fits.
+        """
+        count = self._count if rounds is None else min(rounds, self._count)
+        width = max(width, 1)
+        level = 0
+        while -(-count >> level) > width:
+            level += 1
+        if level == 0:
+            return self._levels[0][self._count - count :]
+
+        # The values after the last complete bucket of the level are covered
+        # by at most one complete bucket of every lower level
+        partial = [
+            self._levels[lower][(self._count >> lower) - 1]
+            for lower in range(level)
+            if self._count >> lower & 1
+        ]
+        points = -(-count >> level) - (1 if partial else 0)
+        buckets = self._levels[level] if level < len(self._levels) else []
+        series = buckets[len(buckets) - points :] if points else []
+        if partial:
+            series.append(max(partial))
+        return series
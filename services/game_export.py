@@ -0,0 +1,269 @@
+"""
+Whole games out of and back into the database, for analysis after an event.
+
+Every table of a game is streamed, batch by batch, in primary key order
+into its own file, so memory stays bounded however long the game was:
+
+- "csv": <table>.csv.gz, a header row with the column names and a row per
+  row. Blobs are base64, NULL is an empty field.
+- "columns": <table>.cols, typed and column by column, like Parquet without
+  the dependency. After the magic bytes, a length-prefixed JSON header with
+  the table and its columns (name and type: int, str, datetime or bytes),
+  then row groups of a row count and a zlib-compressed chunk per column.
+  Ints are 64-bit little endian, strings and blobs 32-bit little endian
+  lengths followed by the data, and every chunk starts with a byte per row
+  that is 0 for NULL. A row count of 0 ends the file.
+
+Importing goes the other way, into a new or empty database, in bulk inserts
+of a batch of rows and in a single transaction.
+"""
+
+import base64
+import csv
+import datetime
+import gzip
+import json
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Iterator
+
+from sqlalchemy import Connection, Engine, Table, insert, select
+
+from models.scores import Base, DashboardSnapshot
+
+FORMATS = {"csv": ".csv.gz", "columns": ".cols"}
+
+_MAGIC = b"CSSCOLS1"
+_COUNT = struct.Struct("<I")
+# Rows per fetch, insert and row group
+_BATCH_ROWS = 10_000
+
+# In foreign key order, without the cache of what the dashboard showed last
+GAME_TABLES = [
+    table
+    for table in Base.metadata.sorted_tables
+    if table is not DashboardSnapshot.__table__
+]
+
+
+def _column_types(table: Table) -> list[tuple[str, str]]:
+    types = {int: "int", str: "str", datetime.datetime: "datetime", bytes: "bytes"}
+    return [(column.name, types[column.type.python_type]) for column in table.columns]
+
+
+def _stream_rows(connection: Connection, table: Table, batch_rows: int) -> Iterator[list]:
+    """The rows of a table in batches, never more than one batch in memory."""
+    result = connection.execution_options(yield_per=batch_rows).execute(
+        select(table).order_by(*table.primary_key.columns)
+    )
+    for partition in result.partitions():
+        yield partition
+
+
+# CSV
+
+
+def _to_csv(value, kind: str):
+    if value is None:
+        return ""
+    if kind == "datetime":
+        return value.isoformat()
+    if kind == "bytes":
+        return base64.b64encode(value).decode()
+    return value
+
+
+def _from_csv(value: str, kind: str):
+    if kind == "str":
+        return value
+    if value == "":
+        return None
+    if kind == "int":
+        return int(value)
+    if kind == "datetime":
+        return datetime.datetime.fromisoformat(value)
+    return base64.b64decode(value)
+
+
+def _write_csv(path: str, table: Table, batches: Iterator[list]) -> int:
+    types = _column_types(table)
+    count = 0
+    with gzip.open(path, "wt", newline="", compresslevel=6) as file:
+        writer = csv.writer(file)
+        writer.writerow([name for name, _ in types])
+        for rows in batches:
+            writer.writerows(
+                [_to_csv(value, kind) for value, (_, kind) in zip(row, types)]
+                for row in rows
+            )
+            count += len(rows)
+    return count
+
+
+def _read_csv(path: str, table: Table, batch_rows: int) -> Iterator[list[dict]]:
+    types = dict(_column_types(table))
+    with gzip.open(path, "rt", newline="") as file:
+        reader = csv.reader(file)
+        names = next(reader)
+        kinds = [types[name] for name in names]
+        batch = []
+        for row in reader:
+            batch.append(
+                {
+                    name: _from_csv(value, kind)
+                    for name, kind, value in zip(names, kinds, row)
+                }
+            )
+            if len(batch) == batch_rows:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+# Columns
+
+
+def _pack_chunk(values: list, kind: str) -> bytes:
+    present = bytes(value is not None for value in values)
+    if kind == "int":
+        data = array("q", [0 if value is None else value for value in values])
+    else:
+        if kind == "datetime":
+            values = [None if value is None else value.isoformat() for value in values]
+        if kind != "bytes":
+            values = [None if value is None else value.encode() for value in values]
+        values = [b"" if value is None else value for value in values]
+        data = array("I", [len(value) for value in values])
+    if sys.byteorder == "big":
+        data.byteswap()
+    parts = [present, data.tobytes()]
+    if kind != "int":
+        parts.extend(values)
+    return zlib.compress(b"".join(parts))
+
+
+def _unpack_chunk(chunk: bytes, count: int, kind: str) -> list:
+    data = zlib.decompress(chunk)
+    present = data[:count]
+    typecode = "q" if kind == "int" else "I"
+    end = count + count * array(typecode).itemsize
+    numbers = array(typecode, data[count:end])
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    if kind == "int":
+        values = numbers.tolist()
+    else:
+        values = []
+        for length in numbers:
+            values.append(data[end : end + length])
+            end += length
+        if kind != "bytes":
+            values = [value.decode() for value in values]
+        if kind == "datetime":
+            values = [datetime.datetime.fromisoformat(value) for value in values]
+    return [value if is_present else None for value, is_present in zip(values, present)]
+
+
+def _write_columns(path: str, table: Table, batches: Iterator[list]) -> int:
+    types = _column_types(table)
+    header = json.dumps({"table": table.name, "columns": types}).encode()
+    count = 0
+    with open(path, "wb") as file:
+        file.write(_MAGIC + _COUNT.pack(len(header)) + header)
+        for rows in batches:
+            file.write(_COUNT.pack(len(rows)))
+            for column, (_, kind) in zip(zip(*rows), types):
+                chunk = _pack_chunk(list(column), kind)
+                file.write(_COUNT.pack(len(chunk)) + chunk)
+            count += len(rows)
+        file.write(_COUNT.pack(0))
+    return count
+
+
+def _read_count(file) -> int:
+    return _COUNT.unpack(file.read(_COUNT.size))[0]
+
+
+def _read_columns(path: str, table: Table, batch_rows: int) -> Iterator[list[dict]]:
+    """Rows a row group at a time, whatever batch_rows it was written with."""
+    with open(path, "rb") as file:
+        if file.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a columns export")
+        header = json.loads(file.read(_read_count(file)))
+        names = [name for name, _ in header["columns"]]
+        while count := _read_count(file):
+            columns = [
+                _unpack_chunk(file.read(_read_count(file)), count, kind)
+                for _, kind in header["columns"]
+            ]
+            yield [dict(zip(names, row)) for row in zip(*columns)]
+
+
+_WRITERS = {"csv": _write_csv, "columns": _write_columns}
+_READERS = {"csv": _read_csv, "columns": _read_columns}
+
+
+def export_game(
+    engine: Engine, directory: str, fmt: str = "columns", batch_rows: int = _BATCH_ROWS
+) -> dict[str, int]:
+    """Write every table of the game in a database to a directory.
+
+    Args:
+        engine: Engine of the database, e.g. an archived game.
+        directory: Where to write a file per table, created if needed.
+        fmt: A key of FORMATS.
+        batch_rows: Rows fetched and written at a time.
+
+    Returns:
+        The number of rows written per table.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    # One read transaction, so the tables agree with each other
+    with engine.connect() as connection, connection.begin():
+        for table in GAME_TABLES:
+            path = os.path.join(directory, table.name + FORMATS[fmt])
+            counts[table.name] = _WRITERS[fmt](
+                path, table, _stream_rows(connection, table, batch_rows)
+            )
+    return counts
+
+
+def import_game(
+    engine: Engine, directory: str, batch_rows: int = _BATCH_ROWS
+) -> dict[str, int]:
+    """Load a game written by export_game, in either format.
+
+    Args:
+        engine: Engine of a database prepared with prepare_database, with
+            none of GAME_TABLES holding rows, not even teams or services.
+        directory: What export_game wrote. Tables without a file stay empty.
+        batch_rows: Rows inserted at a time, for CSV.
+
+    Returns:
+        The number of rows inserted per table.
+    """
+    counts = {}
+    with engine.begin() as connection:
+        # Archiving keeps the teams and services, whose ids would clash
+        for table in GAME_TABLES:
+            if connection.scalar(select(1).select_from(table).limit(1)):
+                raise ValueError(
+                    f"Can only import into an empty database, {table.name} has rows"
+                )
+        for table in GAME_TABLES:
+            for fmt, extension in FORMATS.items():
+                path = os.path.join(directory, table.name + extension)
+                if os.path.exists(path):
+                    break
+            else:
+                continue
+            counts[table.name] = 0
+            for rows in _READERS[fmt](path, table, batch_rows):
+                connection.execute(insert(table), rows)
+                counts[table.name] += len(rows)
+    return counts
@@ -0,0 +1,156 @@
+"""
+Ranks of every team on the scoreboard, kept up to date round by round, and
+their history.
+
+Teams are ranked by score. Equal scores share a rank (1, 2, 2, 4) and are
+listed by name, so the order never depends on the order of the scoreboard.
+"""
+
+from bisect import bisect_left, insort
+
+from sqlalchemy import Connection, bindparam, func, select
+from sqlalchemy.orm import Session
+
+from models.scores import Team, TeamHistory
+from models.series import CHUNK_ROUNDS, TeamSeries
+from services.series_store import HistoryStore, join_chunks
+
+# Re-sort instead of moving teams one by one once more than 1 in this many
+# teams changed score: a sort of nearly sorted scores is linear
+_RESORT_FRACTION = 8
+
+
+class Leaderboard:
+    def __init__(self) -> None:
+        # (-score, name), best first
+        self._order: list[tuple[int, str]] = []
+        self._scores: dict[str, int] = {}
+
+    def update(self, scores: dict[str, int]) -> None:
+        """Replace the scores, teams missing from them leave the leaderboard."""
+        changed = [
+            (name, score)
+            for name, score in scores.items()
+            if self._scores.get(name) != score
+        ]
+        gone = [name for name in self._scores if name not in scores]
+        if len(changed) + len(gone) > len(self._order) // _RESORT_FRACTION:
+            self._scores = dict(scores)
+            self._order = sorted((-score, name) for name, score in scores.items())
+            return
+        for name in gone:
+            self._remove(name)
+        for name, score in changed:
+            if name in self._scores:
+                self._remove(name)
+            self._scores[name] = score
+            insort(self._order, (-score, name))
+
+    def _remove(self, name: str) -> None:
+        key = (-self._scores.pop(name), name)
+        del self._order[bisect_left(self._order, key)]
+
+    def rank_of_score(self, score: int) -> int:
+        """The rank a team with this score has: one more than the number of
+        teams with a higher score."""
+        return bisect_left(self._order, (-score,)) + 1
+
+    def rank(self, name: str) -> int | None:
+        if name not in self._scores:
+            return None
+        return self.rank_of_score(self._scores[name])
+
+    def gaps(self, name: str) -> tuple[int | None, int | None]:
+        """Points behind the team listed above and ahead of the one below,
+        None at the top or bottom."""
+        index = bisect_left(self._order, (-self._scores[name], name))
+        score = self._scores[name]
+        above = -self._order[index - 1][0] - score if index > 0 else None
+        below = (
+            score + self._order[index + 1][0]
+            if index + 1 < len(self._order)
+            else None
+        )
+        return above, below
+
+    def standings(self) -> list[tuple[int, str, int]]:
+        """(rank, name, score) of every team, best first."""
+        standings = []
+        rank = 0
+        previous_score = None
+        for position, (negative_score, name) in enumerate(self._order, start=1):
+            if -negative_score != previous_score:
+                rank = position
+                previous_score = -negative_score
+            standings.append((rank, name, -negative_score))
+        return standings
+
+
+class RankHistoryStore(HistoryStore):
+    """Writes team_history, keyed by team_id."""
+
+    model = TeamHistory
+    key_columns = ("team_id",)
+    series_class = TeamSeries
+
+
+# The chunks of every team from the latest one back, a parameter further
+_LATEST_CHUNKS = (
+    select(Team.name, TeamHistory.first_round_id, TeamHistory.score, TeamHistory.rank)
+    .join(Team, Team.id == TeamHistory.team_id)
+    .where(
+        TeamHistory.chunk
+        >= select(func.max(TeamHistory.chunk)).scalar_subquery() - bindparam("chunks")
+    )
+    .order_by(TeamHistory.chunk)
+)
+
+
+def read_leaderboard(connection: Connection | Session, delta_rounds: int) -> list[dict]:
+    """The latest standings of all teams, best first.
+
+    Only reads the latest chunks of the team histories, back to the one
+    delta_rounds ago.
+
+    Args:
+        connection: Connection to the score database.
+        delta_rounds: Compare the rank with the one this many rounds ago.
+
+    Returns:
+        Per team a dict with rank, team, score, rank_delta (positive when
+        the team climbed, None without an old rank), gap_above and
+        gap_below (see Leaderboard.gaps).
+    """
+    all_series = join_chunks(
+        TeamSeries,
+        connection.execute(
+            _LATEST_CHUNKS, {"chunks": delta_rounds // CHUNK_ROUNDS + 1}
+        ),
+    )
+    if not all_series:
+        return []
+    latest_round_id = max(series.last_round_id for series in all_series.values())
+    # Teams that left the scoreboard don't have the latest round
+    current = {
+        name: series
+        for name, series in all_series.items()
+        if series.last_round_id == latest_round_id
+    }
+    leaderboard = Leaderboard()
+    leaderboard.update({name: series.score[-1] for name, series in current.items()})
+
+    rows = []
+    for rank, name, score in leaderboard.standings():
+        old_rank = current[name].rank_at(latest_round_id - delta_rounds)
+        gap_above, gap_below = leaderboard.gaps(name)
+        rows.append(
+            {
+                "rank": rank,
+                "team": name,
+                "score": score,
+                "rank_delta": None if old_rank is None else old_rank - rank,
+                "gap_above": gap_above,
+                "gap_below": gap_below,
+            }
+        )
+    return rows
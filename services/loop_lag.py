@@ -0,0 +1,23 @@
+import time
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop gets around to a periodic tick.
+
+    Call tick() from a timer firing every `interval` seconds; any time on
+    top of that interval is time the loop was blocked."""
+
+    def __init__(self, interval: float = 0.02) -> None:
+        self.interval = interval
+        self.max_lag_s = 0.0
+        self._last_tick = time.perf_counter()
+
+    def tick(self) -> None:
+        now = time.perf_counter()
+        self.max_lag_s = max(self.max_lag_s, now - self._last_tick - self.interval)
+        self._last_tick = now
+
+    def reset(self) -> float:
+        """Return the max lag seen since the previous reset and start over."""
+        max_lag_s, self.max_lag_s = self.max_lag_s, 0.0
+        return max_lag_s
@@ -0,0 +1,159 @@
+"""
+Low-overhead instrumentation of the hot paths.
+
+Timings and sizes go into rolling histograms of the last HISTOGRAM_SIZE
+observations, events into plain counters. Both are written from the event
+loop and the database worker, so every read and update holds a lock: a
+read-modify-write of a counter is not atomic, even under the GIL.
+
+Everything records into the module-level `metrics`, e.g.:
+
+    with metrics.timer("ingest.total_ms"):
+        ...
+    metrics.increment("http.not_modified")
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Iterator
+
+HISTOGRAM_SIZE = 256
+QUANTILES = (0.5, 0.95)
+
+
+class RollingHistogram:
+    """The last observations of a value, plus running totals since start."""
+
+    __slots__ = ("_values", "count", "total")
+
+    def __init__(self, size: int = HISTOGRAM_SIZE) -> None:
+        self._values: deque[float] = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self._values.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> dict:
+        """last, mean, p50, p95 and max of the recent observations, count and
+        sum of all of them."""
+        values = sorted(self._values)
+        if not values:
+            return {"count": 0, "sum": 0.0}
+        summary = {
+            "count": self.count,
+            "sum": self.total,
+            "last": self._values[-1],
+            "mean": sum(values) / len(values),
+            "max": values[-1],
+        }
+        for quantile in QUANTILES:
+            # Nearest rank
+            index = max(math.ceil(quantile * len(values)) - 1, 0)
+            summary[f"p{round(quantile * 100)}"] = values[index]
+        return summary
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._histograms: dict[str, RollingHistogram] = {}
+        self._counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = RollingHistogram()
+            histogram.observe(value)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counter(self, name: str) -> int:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Observe the time the block takes in ms, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000)
+
+    def snapshot(self) -> dict:
+        """Summaries of all histograms and the counters, sorted by name."""
+        with self._lock:
+            return {
+                "histograms": {
+                    name: self._histograms[name].summary()
+                    for name in sorted(self._histograms)
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+metrics = Metrics()
+
+
+def _prometheus_name(name: str) -> str:
+    return "cybernet_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def to_prometheus(snapshot: dict) -> str:
+    """A Metrics.snapshot in the Prometheus text exposition format, histograms
+    as summaries over their recent observations."""
+    lines = []
+    for name, summary in snapshot["histograms"].items():
+        metric = _prometheus_name(name)
+        lines.append(f"# TYPE {metric} summary")
+        for quantile in QUANTILES:
+            key = f"p{round(quantile * 100)}"
+            if key in summary:
+                lines.append(f'{metric}{{quantile="{quantile}"}} {summary[key]}')
+        lines.append(f"{metric}_sum {summary['sum']}")
+        lines.append(f"{metric}_count {summary['count']}")
+    for name, value in snapshot["counters"].items():
+        metric = _prometheus_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def export_metrics(path: str, export_format: str) -> None:
+    """Write the current metrics to a file.
+
+    Args:
+        path: File to write to.
+        export_format: "jsonl" appends one timestamped snapshot per call,
+            "prometheus" replaces the file, e.g. for node_exporter's
+            textfile collector.
+    """
+    snapshot = metrics.snapshot()
+    if export_format == "jsonl":
+        with open(path, "a") as metrics_file:
+            metrics_file.write(json.dumps({"time": time.time(), **snapshot}) + "\n")
+    elif export_format == "prometheus":
+        # Replace atomically, so a scrape never sees half a file
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as metrics_file:
+            metrics_file.write(to_prometheus(snapshot))
+        os.replace(temporary_path, path)
+    else:
+        raise ValueError(f"Unknown metrics format {export_format!r}")
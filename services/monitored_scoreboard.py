@@ -0,0 +1,188 @@
+"""
+What the dashboard keeps per scoreboard it watches: where to fetch it, the
+database it's stored in and the round clock it's polled on.
+
+SQLAlchemy and httpx are only imported by open(), on the database worker,
+so they don't hold up the first frame.
+"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING
+
+from config.settings import NUM_SAMPLES, REFRESH_ADAPTIVE, SNAPSHOT_CACHE_ROUNDS
+from services.db_worker import DatabaseWorker
+from services.refresh_scheduler import (
+    FAILED,
+    NEW_ROUND,
+    NO_NEW_ROUND,
+    RefreshScheduler,
+)
+from services.snapshot_cache import write_cached_snapshot
+
+if TYPE_CHECKING:
+    import httpx
+
+    from services.dashboard_model import DashboardModel
+
+
+class MonitoredScoreboard:
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        team: str,
+        db_path: str,
+        refresh_interval: int,
+        counter: bool = False,
+        num_samples: int = 0,
+    ) -> None:
+        """
+        Args:
+            name: Shown on its tab.
+            url: URL to GET.
+            team: Our team on this scoreboard.
+            db_path: Database file to store it in.
+            refresh_interval: Seconds between polls, see RefreshScheduler.
+            counter: A development server, which gets /<num_samples>/<index>
+                appended to the url and starts on an empty database.
+            num_samples: Rounds of the development server.
+        """
+        self.name = name
+        self.url = url
+        self.team = team
+        self.db_path = db_path
+        self.counter = counter
+        self._num_samples = num_samples
+        self._index_counter = 1
+        # Every request of the dev server is a new round, no clock to follow
+        self.scheduler = RefreshScheduler(
+            adaptive=REFRESH_ADAPTIVE and not counter, interval=refresh_interval
+        )
+        # time.monotonic() of the next poll
+        self.next_poll = 0.0
+        self.updating = False
+        # Set up by open()
+        self.backend: asyncio.Task | None = None
+        self.engine = None
+        self.score_store = None
+        self.stats_retriever = None
+        self.retention = None
+        self.dashboard: "DashboardModel | None" = None
+        # Last snapshot read, and the new rounds since one was cached
+        self._snapshot: dict | None = None
+        self._rounds_not_cached = 0
+
+    @classmethod
+    def from_settings(cls, entry: dict, refresh_interval: int) -> "MonitoredScoreboard":
+        """A scoreboard from an entry of SCOREBOARDS."""
+        return cls(
+            name=entry["name"],
+            url=entry["url"],
+            team=entry["team"],
+            db_path=entry.get("db_path", f"db/{entry['name']}.sqlite3"),
+            refresh_interval=refresh_interval,
+            counter=entry.get("dev_server", False),
+            num_samples=entry.get("num_samples", NUM_SAMPLES),
+        )
+
+    def open(
+        self,
+        db_worker: DatabaseWorker,
+        client: "httpx.AsyncClient",
+        archive: bool = False,
+    ) -> "DashboardModel":
+        """Imports, schema checks and loading what's stored so far. Runs on
+        the database worker.
+
+        Args:
+            archive: Archive the stored game first, see
+                RetentionService.archive_game.
+        """
+        from config.settings import SERVICE_HISTORY_BACKEND
+        from models.database import create_db_engine
+        from models.migrations import prepare_database
+        from services.dashboard_model import DashboardModel
+        from services.retention import RetentionService
+        from services.score_store import ScoreStoreService
+        from services.stats_retriever import StatsRetriever
+
+        engine = create_db_engine(self.db_path)
+        prepare_database(engine, reset=self.counter)
+        self.engine = engine
+        self.score_store = ScoreStoreService(
+            engine, db_worker, me_team=self.team, client=client
+        )
+        self.stats_retriever = StatsRetriever(engine, self.team)
+        self.retention = RetentionService(engine)
+        if archive:
+            # Before anything of the new game is stored
+            self.retention.archive_game()
+        self.scheduler.add_labels(self.stats_retriever.get_round_timestamps())
+        dashboard = DashboardModel()
+        if SERVICE_HISTORY_BACKEND == "columnar":
+            dashboard.load_history(
+                self.stats_retriever.get_service_history(),
+                self.stats_retriever.get_current_round_number(),
+            )
+        else:
+            for round_id, services in self.stats_retriever.get_recent_service_rounds():
+                dashboard.apply_round(round_id, services)
+        return dashboard
+
+    async def fetch(self) -> bool:
+        """Fetch and store the scoreboard, and tell the scheduler how it went.
+
+        Returns:
+            True when a new round was stored, and added to the dashboard model.
+        """
+        polled = time.monotonic()
+        missed = self.scheduler.may_have_missed_rounds(polled)
+        if self.counter:
+            updated = await self.score_store.get_scores(
+                f"{self.url}/{self._num_samples}/{self._index_counter}", missed
+            )
+            self._index_counter += 1
+        else:
+            updated = await self.score_store.get_scores(self.url, missed)
+
+        if updated:
+            self.scheduler.add_labels([self.score_store.latest_timestamp])
+            outcome = NEW_ROUND
+        elif self.score_store.last_fetch_failed:
+            outcome = FAILED
+        else:
+            outcome = NO_NEW_ROUND
+        self.scheduler.record(polled, outcome)
+        if updated:
+            self.dashboard.apply_round(*self.score_store.latest_round)
+            self._rounds_not_cached += 1
+        return updated
+
+    def schedule(self) -> None:
+        """Plan the next poll on the round clock."""
+        now = time.monotonic()
+        self.next_poll = now + self.scheduler.next_delay(now)
+
+    def read_snapshot(self, services: dict | None) -> dict:
+        """The dashboard snapshot, with services from the in-memory model.
+        Cached for the next start every SNAPSHOT_CACHE_ROUNDS rounds. Runs on
+        the database worker."""
+        snapshot = self.stats_retriever.get_dashboard_snapshot(include_services=False)
+        snapshot["services"] = services
+        self._snapshot = snapshot
+        if self._rounds_not_cached >= SNAPSHOT_CACHE_ROUNDS:
+            self.cache_snapshot()
+        return snapshot
+
+    def cache_snapshot(self) -> None:
+        """Store the last snapshot read for the next start, unless it's stored
+        already. Runs on the database worker."""
+        if self._snapshot is None or not self._rounds_not_cached:
+            return
+        write_cached_snapshot(self.engine, self._snapshot)
+        self._rounds_not_cached = 0
+
+    async def aclose(self) -> None:
+        if self.score_store is not None:
+            await self.score_store.aclose()
@@ -0,0 +1,169 @@
+"""
+When to poll the scoreboard next, aligned to the game's round clock.
+
+The round length comes from the timestamps of the rounds ("%H:%M" labels),
+the phase from when we saw a new round appear between two polls. Mid-round
+there is nothing to fetch, so we wait until just before the next round is
+expected and then poll densely until it shows up. Without a phase yet, or
+with a round that's late, we poll every REFRESH_INTERVAL_S like before.
+
+Pure bookkeeping on the times passed in, so the replay benchmark can run it
+against a simulated clock.
+"""
+
+import datetime
+import statistics
+from collections import deque
+from typing import Iterable
+
+from config.settings import (
+    REFRESH_ADAPTIVE,
+    REFRESH_BOUNDARY_WINDOW_S,
+    REFRESH_INTERVAL_S,
+    REFRESH_MAX_BACKOFF_S,
+    REFRESH_MAX_INTERVAL_S,
+    REFRESH_MIN_INTERVAL_S,
+)
+
+# Outcomes of a poll
+NEW_ROUND = "new"
+NO_NEW_ROUND = "same"
+FAILED = "error"
+
+_LABEL_FORMAT = "%H:%M"
+_DAY_S = 24 * 60 * 60
+# Labels of more rounds than this don't improve the estimate
+_LABELS_KEPT = 50
+# Rounds the phase of the round clock is estimated from
+_PHASE_ROUNDS = 8
+
+
+def label_seconds(label: str) -> int | None:
+    """Seconds since midnight of a round label, None if it isn't a time."""
+    try:
+        time = datetime.datetime.strptime(label, _LABEL_FORMAT)
+    except ValueError:
+        return None
+    return time.hour * 60 * 60 + time.minute * 60
+
+
+def round_length_from_labels(labels: Iterable[str]) -> float | None:
+    """The round length in seconds from consecutive round labels.
+
+    Labels only have minutes, so the steps of e.g. 90 second rounds
+    alternate between 1 and 2 minutes: average them, leaving out the gaps
+    of rounds we didn't see.
+
+    Returns:
+        The round length, or None if the labels don't tell.
+    """
+    seconds = [label_seconds(label) for label in labels]
+    steps = [
+        (current - previous) % _DAY_S
+        for previous, current in zip(seconds, seconds[1:])
+        if previous is not None and current is not None
+    ]
+    steps = [step for step in steps if step > 0]
+    if not steps:
+        return None
+    median = statistics.median(steps)
+    steps = [step for step in steps if step <= 3 * median]
+    return sum(steps) / len(steps)
+
+
+class RefreshScheduler:
+    def __init__(
+        self,
+        adaptive: bool = REFRESH_ADAPTIVE,
+        interval: float = REFRESH_INTERVAL_S,
+    ) -> None:
+        """
+        Args:
+            adaptive: Follow the round clock, instead of polling every
+                `interval` (apart from backing off on errors).
+            interval: Seconds between polls while the round clock is unknown.
+        """
+        self._adaptive = adaptive
+        self._interval = interval
+        self._labels: deque[str] = deque(maxlen=_LABELS_KEPT)
+        self._label_round_length: float | None = None
+        # Estimated times new rounds appeared, on the caller's clock
+        self._boundaries: deque[float] = deque(maxlen=_LABELS_KEPT)
+        self._last_poll: float | None = None
+        self._last_outcome: str | None = None
+        self._failures = 0
+
+    def add_labels(self, labels: Iterable[str]) -> None:
+        """Learn the round length from round labels, oldest first."""
+        self._labels.extend(labels)
+        self._label_round_length = round_length_from_labels(self._labels)
+
+    @property
+    def round_length(self) -> float | None:
+        """Seconds per round, from the labels or else the rounds we saw."""
+        if self._label_round_length is not None:
+            return self._label_round_length
+        steps = [
+            current - previous
+            for previous, current in zip(self._boundaries, list(self._boundaries)[1:])
+        ]
+        return statistics.median(steps) if steps else None
+
+    def may_have_missed_rounds(self, now: float) -> bool:
+        """Whether a whole round may have passed since the last poll that
+        got an answer, or the round length isn't known yet."""
+        round_length = self.round_length
+        return (
+            self._last_poll is None
+            or round_length is None
+            or now - self._last_poll >= round_length
+        )
+
+    def record(self, now: float, outcome: str) -> None:
+        """Record the outcome of the poll sent at `now`."""
+        if outcome == FAILED:
+            self._failures += 1
+            return
+        self._failures = 0
+        if (
+            outcome == NEW_ROUND
+            and self._last_outcome == NO_NEW_ROUND
+            and self._last_poll is not None
+        ):
+            # The round appeared since the previous poll, which is close by
+            # when we were polling densely
+            self._boundaries.append((self._last_poll + now) / 2)
+        self._last_poll = now
+        self._last_outcome = outcome
+
+    def next_delay(self, now: float) -> float:
+        """Seconds from `now` until the next poll."""
+        if self._failures:
+            return min(
+                REFRESH_MIN_INTERVAL_S * 2**self._failures, REFRESH_MAX_BACKOFF_S
+            )
+        round_length = self.round_length
+        if not self._adaptive or round_length is None or not self._boundaries:
+            return self._interval
+
+        # Rounds show up some random time after they start: project the
+        # recent boundaries onto the last one, the earliest is the closest
+        # to the start of the round and the spread is how late it may be
+        last = self._boundaries[-1]
+        projected = [
+            boundary + round((last - boundary) / round_length) * round_length
+            for boundary in list(self._boundaries)[-_PHASE_ROUNDS:]
+        ]
+        expected = min(projected) + round_length
+        spread = max(projected) - min(projected)
+        # Skip rounds that never showed up, e.g. while the game was paused
+        while expected + spread + round_length / 2 < now:
+            expected += round_length
+        window = min(REFRESH_BOUNDARY_WINDOW_S, round_length / 4)
+        if now < expected - window:
+            # Mid-round, still poll now and then in case the clock is off
+            return min(expected - window - now, REFRESH_MAX_INTERVAL_S)
+        if now < expected + spread + window:
+            return REFRESH_MIN_INTERVAL_S
+        # Late round
+        return min(self._interval, REFRESH_MAX_INTERVAL_S)
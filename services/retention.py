@@ -0,0 +1,175 @@
+"""
+Keeps the database from growing forever: thins out old rounds while a game
+runs, and archives a finished game on request (--archive) before the next
+one is stored.
+
+Everything here runs on the database worker.
+"""
+
+import os
+
+from sqlalchemy import ColumnElement, Connection, Engine, delete, func, select
+from textual import log
+
+from config.settings import (
+    ARCHIVE_DIR,
+    RETENTION_BATCH_ROUNDS,
+    RETENTION_DETAIL_ROUNDS,
+    RETENTION_DOWNSAMPLE_ROUNDS,
+    RETENTION_VACUUM_PAGES,
+    SERVICE_HISTORY_ROUNDS,
+)
+from models.scores import (
+    DashboardSnapshot,
+    GameRound,
+    HighscoreAndSLA,
+    ServiceHistory,
+    ServiceScore,
+    ServiceStatus,
+    Team,
+    TeamHistory,
+)
+
+# The data of one game; services and teams are kept so their ids stay valid
+_GAME_TABLES = (
+    DashboardSnapshot,
+    ServiceHistory,
+    TeamHistory,
+    ServiceScore,
+    ServiceStatus,
+    HighscoreAndSLA,
+    GameRound,
+)
+_INCREMENTAL = 2
+
+
+class RetentionService:
+    def __init__(
+        self,
+        engine: Engine,
+        detail_rounds: int | None = RETENTION_DETAIL_ROUNDS,
+        downsample_rounds: int = RETENTION_DOWNSAMPLE_ROUNDS,
+    ) -> None:
+        """
+        Args:
+            engine: Engine of the score database.
+            detail_rounds: Rounds to keep every row of, None keeps everything.
+            downsample_rounds: Of the older rounds, keep every this many.
+        """
+        self._engine = engine
+        self._detail_rounds = (
+            None if detail_rounds is None else max(detail_rounds, SERVICE_HISTORY_ROUNDS)
+        )
+        self._downsample_rounds = downsample_rounds
+        # Every round up to here has been compacted
+        self._compacted_round_id: int | None = None
+
+    def _is_dropped(self, round_id_column: ColumnElement[int]) -> ColumnElement[bool]:
+        return round_id_column % self._downsample_rounds != 0
+
+    def _find_compacted_round_id(self, connection: Connection, latest: int) -> int:
+        """The round before the oldest one that still has rows to drop."""
+        candidates = [
+            connection.scalar(
+                select(func.min(HighscoreAndSLA.game_round_id)).where(
+                    self._is_dropped(HighscoreAndSLA.game_round_id)
+                )
+            )
+        ]
+        for team_id in connection.scalars(select(Team.id)).all():
+            for model in (ServiceScore, ServiceStatus):
+                candidates.append(
+                    connection.scalar(
+                        select(func.min(model.game_round_id)).where(
+                            model.team_id == team_id,
+                            self._is_dropped(model.game_round_id),
+                        )
+                    )
+                )
+        return min(
+            (candidate for candidate in candidates if candidate is not None),
+            default=latest + 1,
+        ) - 1
+
+    def compact_step(self) -> int:
+        """Drop the rows of at most RETENTION_BATCH_ROUNDS old rounds.
+
+        Returns:
+            The number of rows deleted.
+        """
+        if self._detail_rounds is None:
+            return 0
+        deleted = 0
+        with self._engine.begin() as connection:
+            latest = connection.scalar(select(func.max(GameRound.id))) or 0
+            if self._compacted_round_id is None:
+                self._compacted_round_id = self._find_compacted_round_id(
+                    connection, latest
+                )
+            start = self._compacted_round_id
+            end = min(start + RETENTION_BATCH_ROUNDS, latest - self._detail_rounds)
+            if end <= start:
+                return 0
+
+            def in_batch(round_id_column: ColumnElement[int]) -> tuple:
+                return (
+                    round_id_column > start,
+                    round_id_column <= end,
+                    self._is_dropped(round_id_column),
+                )
+
+            # Per team, so the deletes walk the (team_id, game_round_id) indexes
+            for team_id in connection.scalars(select(Team.id)).all():
+                for model in (ServiceScore, ServiceStatus):
+                    deleted += connection.execute(
+                        delete(model).where(
+                            model.team_id == team_id, *in_batch(model.game_round_id)
+                        )
+                    ).rowcount
+            deleted += connection.execute(
+                delete(HighscoreAndSLA).where(*in_batch(HighscoreAndSLA.game_round_id))
+            ).rowcount
+        self._compacted_round_id = end
+
+        with self._engine.connect() as connection:
+            if (
+                connection.exec_driver_sql("PRAGMA auto_vacuum").scalar()
+                == _INCREMENTAL
+            ):
+                # Frees one page per (empty) result row. SQLAlchemy doesn't
+                # fetch rows of statements without columns, so do it by hand.
+                cursor = connection.connection.cursor()
+                try:
+                    cursor.execute(
+                        f"PRAGMA incremental_vacuum({RETENTION_VACUUM_PAGES})"
+                    ).fetchall()
+                finally:
+                    cursor.close()
+        log.info(f"Compacted rounds {start + 1} to {end}: {deleted} rows deleted")
+        return deleted
+
+    def archive_game(self) -> str | None:
+        """Copy the stored game into ARCHIVE_DIR and clear it.
+
+        Returns:
+            Path of the archive, or None when there was nothing to archive.
+        """
+        with self._engine.connect() as connection:
+            last_round_at = connection.scalar(select(func.max(GameRound.timestamp_utc)))
+        if last_round_at is None:
+            return None
+
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        path = os.path.join(ARCHIVE_DIR, f"game-{last_round_at:%Y%m%d-%H%M%S}.sqlite3")
+        with self._engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM INTO ?", (path,))
+        with self._engine.begin() as connection:
+            for model in _GAME_TABLES:
+                connection.execute(delete(model))
+        with self._engine.connect() as connection:
+            # Quick now that the game is gone, and turns on incremental
+            # vacuum for databases created before it existed
+            connection.exec_driver_sql("VACUUM")
+        self._compacted_round_id = None
+        log.info(f"Archived the previous game to {path}")
+        return path
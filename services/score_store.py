@@ -1,86 +1,256 @@
+import asyncio
+import importlib.util
+import json
+import time
+
 import httpx
-from sqlalchemy import Engine, select
+from sqlalchemy import Engine, select, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 from textual import log
 
-from config.settings import ME_TEAM
+from config.settings import (
+    ME_TEAM,
+    TRACKED_TEAMS,
+    HTTP_CONNECT_TIMEOUT_S,
+    HTTP_READ_TIMEOUT_S,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF_S,
+    STREAMING_PARSE,
+    BACKFILL_MISSED_ROUNDS,
+    SERVICE_HISTORY_BACKEND,
+    SERVICE_HISTORY_ROWS,
+)
 from models.scores import (
     Service,
+    Team,
     ServiceStatus,
     HighscoreAndSLA,
     ServiceScore,
     GameRound,
 )
+from services.db_worker import DatabaseWorker
+from services.leaderboard import Leaderboard, RankHistoryStore
+from services.metrics import metrics
+from services.scoreboard_parser import ScoreboardStreamParser
+from services.series_store import SeriesStore
+
+
+def create_http_client(max_connections: int = 1) -> httpx.AsyncClient:
+    """A long-lived client, so the connections to the scoreboards are reused.
+
+    Args:
+        max_connections: At most this many requests at the same time, more
+            wait for a connection to free up.
+    """
+    return httpx.AsyncClient(
+        # HTTP/2 needs the optional h2 package
+        http2=importlib.util.find_spec("h2") is not None,
+        timeout=httpx.Timeout(HTTP_READ_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S),
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60,
+        ),
+    )
 
 
 class ScoreStoreService:
-    def __init__(self, db_engine: Engine) -> None:
+    def __init__(
+        self,
+        db_engine: Engine,
+        db_worker: DatabaseWorker,
+        me_team: str = ME_TEAM,
+        tracked_teams: list[str] | str = TRACKED_TEAMS,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        """
+        Args:
+            db_engine: Engine of the database to store the scores in.
+            db_worker: Worker all database access runs on.
+            me_team: Our team, whose scores the dashboard shows.
+            tracked_teams: Other teams to store the services of, "*" for all.
+            client: Client shared with other scoreboards, which aclose()
+                leaves open. By default the service has its own.
+        """
         self._db_engine = db_engine
+        self._db_worker = db_worker
+        self._me_team = me_team
+        # None stores every team
+        self._teams = None if tracked_teams == "*" else {me_team, *tracked_teams}
+        self._client = client
+        self._owns_client = client is None
+        # ETag / Last-Modified of the last successful response, per URL
+        self._validators: dict[str, dict[str, str]] = {}
+        # Mirror the services and teams tables once loaded, only ever touched
+        # by the db worker
+        self._service_ids: dict[str, int] | None = None
+        self._team_ids: dict[str, int] | None = None
+        # Round id by score_timestamp
+        self._round_ids: dict[str, int] | None = None
+        self._series_store = (
+            SeriesStore() if SERVICE_HISTORY_BACKEND == "columnar" else None
+        )
+        self._write_rows = self._series_store is None or SERVICE_HISTORY_ROWS
+        self._leaderboard = Leaderboard()
+        self._rank_store = RankHistoryStore()
+        # (round_id, services) of the last stored round, for DashboardModel
+        self.latest_round: tuple[int, dict] | None = None
+        # Label of the last stored round, for RefreshScheduler
+        self.latest_timestamp: str | None = None
+        # Whether the last get_scores failed, rather than found nothing new
+        self.last_fetch_failed = False
+        # Whether rounds may have gone by unseen since the last poll, as on
+        # startup or after a failed one, so the next needs the full history
+        self._gap_possible = True
 
-    def _round_is_registered(self, score_timestamp: str) -> bool:
-        with Session(self._db_engine) as session:
-            stmt = select(GameRound).where(GameRound.score_timestamp == score_timestamp)
-            round_result = session.scalars(stmt).first()
-        return round_result is not None
-
-    def _get_round_id(self, timestamp: str) -> int | None:
-        with Session(self._db_engine) as session:
-            stmt = select(GameRound).where(GameRound.score_timestamp == timestamp)
-            round_result = session.scalars(stmt).first()
-            if round_result is None:
-                log.error(f"Round {timestamp} not found!")
-            else:
-                return round_result.id
-
-    def _process_service_status(self, scoreboard: dict, round_id: int) -> None:
-        me = ME_TEAM
-        services_statuses = []
-        for highscore_unit in scoreboard["highscore"]:
-            if highscore_unit["name"] == me:
-                our_services = highscore_unit["services"]
-                for service in our_services:
-                    services_statuses.append((service, our_services[service]["status"]))
-
-        with Session(self._db_engine) as session:
-            for service, status in services_statuses:
-                # 1) Check if Service is known, if not: add
-                service_statement = select(Service).where(Service.name == service)
-                found_service = session.scalars(service_statement).first()
-                if found_service is None:
-                    new_service = Service(name=service)
-                    session.add(new_service)
-                    session.commit()
-                    session.refresh(new_service)
-                    service_id = new_service.id
-                else:
-                    service_id = found_service.id
-                # 2) Add datapoint to ServiceStatus
-                service_status = ServiceStatus(
-                    service_id=service_id, game_round_id=round_id, status=status
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = create_http_client()
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _conditional_headers(self, url: str) -> dict[str, str]:
+        validators = self._validators.get(url, {})
+        headers = {}
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last-modified" in validators:
+            headers["If-Modified-Since"] = validators["last-modified"]
+        return headers
+
+    def _remember_validators(self, url: str, response: httpx.Response) -> None:
+        self._validators[url] = {
+            name: response.headers[name]
+            for name in ("etag", "last-modified")
+            if name in response.headers
+        }
+
+    async def _fetch(self, url: str) -> httpx.Response | None:
+        """GET the url with retries. The body is not read yet, so the caller
+        has to close the returned response."""
+        client = self._get_client()
+        for attempt in range(HTTP_RETRIES + 1):
+            if attempt > 0:
+                metrics.increment("fetch.retries")
+                await asyncio.sleep(HTTP_RETRY_BACKOFF_S * 2 ** (attempt - 1))
+            try:
+                request = client.build_request(
+                    "GET", url, headers=self._conditional_headers(url)
                 )
-                session.add(service_status)
-                session.commit()
+                response = await client.send(request, stream=True)
+            except httpx.TransportError as e:
+                log.error(f"Failed to connect to server: {e!r}")
+                continue
+            if response.status_code < 500:
+                return response
+            await response.aread()
+            log.error(f"Server error {response.status_code}")
+        return None
 
-    def _process_highscore_and_sla(self, scoreboard: dict, round_id: int) -> None:
+    async def _read_scoreboard(
+        self, response: httpx.Response, full_history: bool
+    ) -> dict:
+        if not STREAMING_PARSE:
+            body = await response.aread()
+            with metrics.timer("fetch.parse_ms"):
+                return json.loads(body).get("success")
+        parser = ScoreboardStreamParser(teams=self._teams, full_history=full_history)
+        parse_time = 0.0
+        async for chunk in response.aiter_bytes():
+            start = time.perf_counter()
+            parser.feed(chunk)
+            parse_time += time.perf_counter() - start
+        start = time.perf_counter()
+        scoreboard = parser.result()
+        parse_time += time.perf_counter() - start
+        metrics.observe("fetch.parse_ms", parse_time * 1000)
+        return scoreboard
+
+    def _get_team_services(self, scoreboard: dict) -> dict[str, dict]:
+        """Services of every tracked team on the scoreboard, by team name."""
+        return {
+            highscore_unit["name"]: highscore_unit["services"]
+            for highscore_unit in scoreboard["highscore"]
+            if (self._teams is None or highscore_unit["name"] in self._teams)
+            and "services" in highscore_unit
+        }
+
+    def _load_ids(self, session: Session) -> None:
+        if self._service_ids is None:
+            self._service_ids = dict(
+                session.execute(select(Service.name, Service.id)).all()
+            )
+        if self._team_ids is None:
+            self._team_ids = dict(session.execute(select(Team.name, Team.id)).all())
+        if self._round_ids is None:
+            self._round_ids = dict(
+                session.execute(select(GameRound.score_timestamp, GameRound.id)).all()
+            )
+
+    @staticmethod
+    def _get_or_create_ids(
+        session: Session, model: type[Service | Team], known: dict, names: list[str]
+    ) -> dict:
+        """Map names to ids, inserting the unknown ones in bulk.
+
+        New ids are only added to the cache once the transaction commits."""
+        ids = {name: known[name] for name in names if name in known}
+        missing = [{"name": name} for name in dict.fromkeys(names) if name not in ids]
+        if missing:
+            inserted = session.execute(
+                insert(model).returning(model.name, model.id), missing
+            )
+            ids.update(inserted.all())
+        return ids
+
+    def _process_service_status(
+        self,
+        session: Session,
+        team_services: dict,
+        round_id: int,
+        team_ids: dict,
+        service_ids: dict,
+    ) -> None:
+        if not self._write_rows:
+            return
+        statuses = [
+            {
+                "team_id": team_ids[team],
+                "service_id": service_ids[service],
+                "game_round_id": round_id,
+                "status": services[service]["status"],
+            }
+            for team, services in team_services.items()
+            for service in services
+        ]
+        if statuses:
+            # Core insert: the ORM bulk path costs more than SQLite per row
+            session.execute(insert(ServiceStatus.__table__), statuses)
+
+    def _process_highscore_and_sla(
+        self, session: Session, scoreboard: dict, round_id: int
+    ) -> None:
         if len(scoreboard["highscore_labels"]) == 0:
             # No need to process an empty score ;)
             return
-        me = ME_TEAM
+        me = self._me_team
         label = scoreboard["highscore_labels"][-1]
-        highscores = []
         sla = ""
         highscore = 0
         for highscore_unit in scoreboard["highscore"]:
             if highscore_unit["name"] == me:
                 sla = highscore_unit["sla"]
                 highscore = highscore_unit["scores"][-1]
-            highscores.append(highscore_unit["scores"][-1])
+        # _process_leaderboard ranked every team already
+        position = self._leaderboard.rank_of_score(highscore)
 
-        highscores.sort(reverse=True)
-        position = highscores.index(highscore) + 1
-
-        with Session(self._db_engine) as session:
-            highscore_entry = HighscoreAndSLA(
+        session.execute(
+            insert(HighscoreAndSLA).values(
                 game_round_id=round_id,
                 label=label,
                 score=highscore,
@@ -88,70 +258,322 @@ class ScoreStoreService:
                 sla=sla,
                 me_team=me,
             )
-            session.add(highscore_entry)
-            session.commit()
-
-    def _get_service_id_from_name(self, name: str) -> int | None:
-        with Session(self._db_engine) as session:
-            stmt = select(Service).where(Service.name.ilike("%" + name + "%"))
-            result = session.scalars(stmt).first()
-            if result is None:
-                if len(name) <= 2:
-                    return None
-                else:
-                    return self._get_service_id_from_name(name[1:-1])
-            else:
-                return result.id
-
-    def _process_service_scores(self, scoreboard: dict, round_id: int) -> None:
-        me = ME_TEAM
+        )
+
+    def _process_leaderboard(
+        self, session: Session, scoreboard: dict, round_id: int, team_ids: dict
+    ) -> None:
+        self._leaderboard.update(
+            {
+                highscore_unit["name"]: highscore_unit["scores"][-1]
+                for highscore_unit in scoreboard["highscore"]
+            }
+        )
+        self._rank_store.append_round(
+            session,
+            round_id,
+            {
+                team_ids[name]: (score, rank)
+                for rank, name, score in self._leaderboard.standings()
+            },
+        )
+
+    def _process_service_scores(
+        self,
+        session: Session,
+        team_services: dict,
+        round_id: int,
+        team_ids: dict,
+        service_ids: dict,
+    ) -> None:
+        if not self._write_rows:
+            return
+        scores = [
+            {
+                "team_id": team_ids[team],
+                "service_id": service_ids[service],
+                "game_round_id": round_id,
+                "offense_total": services[service]["capture"],
+                "defence_total": services[service]["lost"],
+            }
+            for team, services in team_services.items()
+            for service in services
+        ]
+        if scores:
+            session.execute(insert(ServiceScore.__table__), scores)
+
+    def _process_service_history(
+        self,
+        session: Session,
+        team_services: dict,
+        round_id: int,
+        team_ids: dict,
+        service_ids: dict,
+    ) -> None:
+        if self._series_store is None:
+            return
+        self._series_store.append_round(
+            session,
+            round_id,
+            {
+                (team_ids[team], service_ids[service]): (
+                    services[service]["capture"],
+                    services[service]["lost"],
+                    services[service]["status"],
+                )
+                for team, services in team_services.items()
+                for service in services
+            },
+        )
+
+    def _round_id_offset(self, labels: list[str]) -> int:
+        """Position in highscore_labels (from 1) minus round id.
+
+        A new database numbers rounds like the game does, and rounds we
+        missed keep their id free for _backfill_rounds. Rounds of a new game,
+        or with only the latest label, continue after the latest round."""
+        if not self._round_ids:
+            return 0
+        latest_timestamp, latest_id = max(
+            self._round_ids.items(), key=lambda item: item[1]
+        )
+        for position in range(len(labels), 0, -1):
+            if labels[position - 1] == latest_timestamp:
+                return position - latest_id
+        if 1 < len(labels) < latest_id:
+            # Only a warning: scoreboards may list just the recent rounds
+            log.warning(
+                f"The scoreboard is back at round {len(labels)}, a new game? "
+                "Restart with --archive to archive the stored one first"
+            )
+        return len(labels) - (latest_id + 1)
+
+    @staticmethod
+    def _register_round(session: Session, timestamp: str, round_id: int) -> int | None:
+        """Insert the round, relying on the unique score_timestamp.
+
+        Returns:
+            The new round id, or None when the round was already registered."""
+        stmt = (
+            sqlite_insert(GameRound)
+            .values(id=round_id, score_timestamp=timestamp)
+            .on_conflict_do_nothing(index_elements=[GameRound.score_timestamp])
+            .returning(GameRound.id)
+        )
+        return session.scalars(stmt).first()
+
+    @staticmethod
+    def _score_at(scores: list[int], index: int, count: int) -> int | None:
+        """A team's score in the round at index of count labels. Teams that
+        joined late have fewer scores, aligned to the latest round."""
+        index += len(scores) - count
+        return scores[index] if index >= 0 else None
+
+    def _backfill_rounds(
+        self, session: Session, scoreboard: dict, offset: int
+    ) -> dict[str, int]:
+        """Register the rounds before the latest one we don't have yet, with
+        our score and position in them, in bulk.
+
+        Services only come with the latest round, so these rounds have none.
+
+        Returns:
+            The ids of the backfilled rounds by score_timestamp.
+        """
+        labels = scoreboard["highscore_labels"]
+        count = len(labels)
+        me = next(
+            (unit for unit in scoreboard["highscore"] if unit["name"] == self._me_team),
+            None,
+        )
+        if me is None:
+            return {}
+        used_ids = set(self._round_ids.values())
+        missing = {}
+        for index, label in enumerate(labels[:-1]):
+            round_id = index + 1 - offset
+            if (
+                label not in self._round_ids
+                and round_id >= 1
+                and round_id not in used_ids
+                and self._score_at(me["scores"], index, count) is not None
+            ):
+                missing[index] = (round_id, label)
+        if not missing:
+            return {}
+
+        # Position is one more than the number of teams with a higher score:
+        # one pass over the teams for all rounds, instead of a sort per round
+        me_scores = {
+            index: self._score_at(me["scores"], index, count) for index in missing
+        }
+        ahead = dict.fromkeys(missing, 0)
         for highscore_unit in scoreboard["highscore"]:
-            if highscore_unit["name"] == me:
-                our_services = highscore_unit["services"]
-                for service in our_services:
-                    service_id = self._get_service_id_from_name(service)
-                    with Session(self._db_engine) as session:
-                        service_score = ServiceScore(
-                            service_id=service_id,
-                            game_round_id=round_id,
-                            offense_total=our_services[service]["capture"],
-                            defence_total=our_services[service]["lost"],
-                        )
-                        session.add(service_score)
-                        session.commit()
+            scores = highscore_unit["scores"]
+            shift = len(scores) - count
+            for index, me_score in me_scores.items():
+                if index + shift >= 0 and scores[index + shift] > me_score:
+                    ahead[index] += 1
 
-    def _register_round(self, timestamp: str) -> int:
-        with Session(self._db_engine) as session:
-            new_round = GameRound(score_timestamp=timestamp)
-            session.add(new_round)
-            session.commit()
-            return new_round.id
+        session.execute(
+            insert(GameRound.__table__),
+            [
+                {"id": round_id, "score_timestamp": label}
+                for round_id, label in missing.values()
+            ],
+        )
+        session.execute(
+            insert(HighscoreAndSLA.__table__),
+            [
+                {
+                    "game_round_id": round_id,
+                    "label": label,
+                    "score": me_scores[index],
+                    "position": ahead[index] + 1,
+                    # Only known for the latest round
+                    "sla": "",
+                    "me_team": self._me_team,
+                }
+                for index, (round_id, label) in missing.items()
+            ],
+        )
+        log.info(f"Backfilled {len(missing)} missed rounds")
+        return {label: round_id for round_id, label in missing.values()}
 
-    async def get_scores(self, url: str) -> bool:
+    def ingest_scoreboard(self, scoreboard: dict) -> bool:
+        """Write a complete scoreboard snapshot, for all tracked teams, in a
+        single transaction, together with the rounds we missed before it.
+
+        Returns:
+            True when a new round was stored, False if it was already known."""
+        labels = scoreboard["highscore_labels"]
+        timestamp = labels[-1]
+        try:
+            with Session(self._db_engine) as session, session.begin():
+                with metrics.timer("ingest.register_ms"):
+                    self._load_ids(session)
+                    offset = self._round_id_offset(labels)
+                    round_id = self._register_round(
+                        session, timestamp, len(labels) - offset
+                    )
+                if BACKFILL_MISSED_ROUNDS:
+                    with metrics.timer("ingest.backfill_ms"):
+                        self._round_ids.update(
+                            self._backfill_rounds(session, scoreboard, offset)
+                        )
+                if round_id is None:
+                    # Commits what was backfilled
+                    return False
+                self._round_ids[timestamp] = round_id
+                with metrics.timer("ingest.ids_ms"):
+                    team_services = self._get_team_services(scoreboard)
+                    # Every team, for the leaderboard
+                    team_ids = self._get_or_create_ids(
+                        session,
+                        Team,
+                        self._team_ids,
+                        [unit["name"] for unit in scoreboard["highscore"]],
+                    )
+                    service_ids = self._get_or_create_ids(
+                        session,
+                        Service,
+                        self._service_ids,
+                        [
+                            name
+                            for services in team_services.values()
+                            for name in services
+                        ],
+                    )
+                args = (session, team_services, round_id, team_ids, service_ids)
+                with metrics.timer("ingest.service_status_ms"):
+                    self._process_service_status(*args)
+                with metrics.timer("ingest.leaderboard_ms"):
+                    self._process_leaderboard(session, scoreboard, round_id, team_ids)
+                with metrics.timer("ingest.highscore_ms"):
+                    self._process_highscore_and_sla(session, scoreboard, round_id)
+                with metrics.timer("ingest.service_scores_ms"):
+                    self._process_service_scores(*args)
+                with metrics.timer("ingest.service_history_ms"):
+                    self._process_service_history(*args)
+                commit_start = time.perf_counter()
+            metrics.observe("ingest.commit_ms", (time.perf_counter() - commit_start) * 1000)
+        except Exception:
+            # The in-memory history and round ids may hold rolled back rounds
+            if self._series_store is not None:
+                self._series_store.invalidate()
+            self._rank_store.invalidate()
+            self._round_ids = None
+            raise
+        self._service_ids.update(service_ids)
+        self._team_ids.update(team_ids)
+        self.latest_round = (
+            round_id,
+            {
+                name: {
+                    "status": service["status"],
+                    "off_total": service["capture"],
+                    "def_total": service["lost"],
+                }
+                for name, service in team_services.get(self._me_team, {}).items()
+            },
+        )
+        self.latest_timestamp = timestamp
+        return True
+
+    async def get_scores(self, url: str, may_have_missed_rounds: bool = False) -> bool:
         """Request score update from server.
 
+        Args:
+            url: Scoreboard URL.
+            may_have_missed_rounds: Whether a round may have come and gone
+                since the last poll, as the caller's round clock tells.
+
         Returns:
-            True on update, False otherwise."""
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url)
-            except httpx.ConnectError:
-                log.error("Failed to connect to server")
+            True on update, False otherwise, see last_fetch_failed."""
+        # Backfilling needs every label and every team's scores of the game,
+        # but only when rounds may have been missed
+        full_history = BACKFILL_MISSED_ROUNDS and (
+            self._gap_possible or may_have_missed_rounds
+        )
+        self.last_fetch_failed = True
+        self._gap_possible = True
+        with metrics.timer("fetch.headers_ms"):
+            response = await self._fetch(url)
+        if response is None:
+            metrics.increment("fetch.failed")
+            return False
+
+        try:
+            if response.status_code != 200:
+                # Drain the body, closing an unread stream drops the connection
+                await response.aread()
+
+            if response.status_code == 304:
+                # Nothing changed since the last round we saw
+                metrics.increment("fetch.not_modified")
+                self.last_fetch_failed = False
+                self._gap_possible = False
                 return False
 
-        if response.status_code != 200:
-            log.error("Failed to get scores!")
-            return False
+            if response.status_code != 200:
+                log.error("Failed to get scores!")
+                metrics.increment("fetch.failed")
+                return False
 
-        scoreboard = response.json().get("success")
-        timestamp = scoreboard["highscore_labels"][-1]
-        if self._round_is_registered(timestamp):
+            with metrics.timer("fetch.body_ms"):
+                scoreboard = await self._read_scoreboard(response, full_history)
+        except httpx.TransportError as e:
+            log.error(f"Failed to read scores: {e!r}")
+            metrics.increment("fetch.failed")
             return False
-        else:
-            round_id = self._register_round(timestamp)
-
-        self._process_service_status(scoreboard, round_id)
-        self._process_highscore_and_sla(scoreboard, round_id)
-        self._process_service_scores(scoreboard, round_id)
+        finally:
+            await response.aclose()
+            metrics.observe("fetch.bytes", response.num_bytes_downloaded)
 
-        return True
+        with metrics.timer("ingest.total_ms"):
+            updated = await self._db_worker.run(self.ingest_scoreboard, scoreboard)
+        self.last_fetch_failed = False
+        self._gap_possible = False
+        # Only once the round is safely stored may the server answer 304
+        self._remember_validators(url, response)
+        return updated
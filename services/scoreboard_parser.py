@@ -0,0 +1,137 @@
+import codecs
+import json
+import re
+
+# A JSON string (group 1 is empty while it is still unterminated) or a bracket
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*("?)|[{}\[\]]')
+_NOT_WHITESPACE = re.compile(r"\S")
+_DECODER = json.JSONDecoder()
+
+_TEAM_PATH = ("success", "highscore", "*")
+_LABELS_PATH = ("success", "highscore_labels")
+_TARGETS = (_TEAM_PATH, _LABELS_PATH)
+
+
+class ScoreboardStreamParser:
+    """Incrementally parses a scoreboard response fed to it in chunks.
+
+    Only the outer levels of the document are scanned. Every element of
+    `highscore` and the `highscore_labels` array is decoded on its own as
+    soon as it is complete and immediately trimmed down to what we store:
+    a team's name, SLA and latest score, plus the services of the teams
+    we track. The result has the same shape as the `success` part of the
+    full document, so it can be ingested as is."""
+
+    def __init__(self, teams: set[str] | None = None, full_history: bool = False):
+        """
+        Args:
+            teams: Teams to keep the services of, None keeps all of them.
+            full_history: Keep every score and label instead of just the last.
+        """
+        self._teams = teams
+        self._full_history = full_history
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        # One [bracket, path, key] per open container we are scanning through
+        self._stack: list[list] = []
+        # Target value that was not complete yet: (path, start)
+        self._pending: tuple[tuple, int] | None = None
+        self._retry_size = 0
+        self._highscore: list[dict] = []
+        self._labels: list[str] = []
+
+    @staticmethod
+    def _child_path(frame: list) -> tuple | None:
+        bracket, path, key = frame
+        if path is None:
+            return None
+        child = path + ("*",) if bracket == "[" else path + (key,)
+        if any(target[: len(child)] == child for target in _TARGETS):
+            return child
+        return None
+
+    def _reduce_team(self, team: dict) -> dict:
+        scores = team.get("scores", [])
+        return {
+            "name": team.get("name"),
+            "sla": team.get("sla", ""),
+            "scores": scores if self._full_history else scores[-1:],
+            "services": (
+                team.get("services", {})
+                if self._teams is None or team.get("name") in self._teams
+                else {}
+            ),
+        }
+
+    def _decode_target(self, path: tuple, start: int) -> bool:
+        """Decode the target value at start, False if it isn't complete yet."""
+        # Only retry once the buffer has doubled, so big values stay linear
+        if len(self._buffer) - start < self._retry_size:
+            self._pending = (path, start)
+            return False
+        try:
+            value, end = _DECODER.raw_decode(self._buffer, start)
+        except json.JSONDecodeError:
+            self._pending = (path, start)
+            self._retry_size = 2 * (len(self._buffer) - start)
+            return False
+        self._pending = None
+        self._retry_size = 0
+        self._pos = end
+        if path == _TEAM_PATH:
+            self._highscore.append(self._reduce_team(value))
+        else:
+            self._labels = value if self._full_history else value[-1:]
+        return True
+
+    def _scan(self) -> None:
+        buffer, stack = self._buffer, self._stack
+        while True:
+            if self._pending is not None:
+                if not self._decode_target(*self._pending):
+                    return
+                continue
+            match = _TOKEN.search(buffer, self._pos)
+            if match is None:
+                return
+            token = match.group()
+            if token[0] == '"':
+                if not match.group(1):
+                    return  # String continues in the next chunk
+                frame = stack[-1] if stack else None
+                if frame is not None and frame[0] == "{" and frame[1] is not None:
+                    follow = _NOT_WHITESPACE.search(buffer, match.end())
+                    if follow is None:
+                        return  # Can't tell a key from a value yet
+                    if follow.group() == ":":
+                        frame[2] = json.loads(token)
+            elif token in "{[":
+                path = self._child_path(stack[-1]) if stack else ()
+                if path in _TARGETS:
+                    if not self._decode_target(path, match.start()):
+                        return
+                    continue
+                stack.append([token, path, None])
+            else:
+                stack.pop()
+            self._pos = match.end()
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += self._decoder.decode(chunk)
+        self._scan()
+        # Drop everything that has been dealt with
+        keep_from = self._pending[1] if self._pending is not None else self._pos
+        if keep_from:
+            self._buffer = self._buffer[keep_from:]
+            self._pos = max(self._pos - keep_from, 0)
+            if self._pending is not None:
+                self._pending = (self._pending[0], 0)
+
+    def result(self) -> dict:
+        # The input is complete, so a pending value can't grow any further
+        self._retry_size = 0
+        self._scan()
+        if self._pending is not None:
+            raise ValueError("Scoreboard ended halfway through a value")
+        return {"highscore": self._highscore, "highscore_labels": self._labels}
@@ -0,0 +1,159 @@
+from typing import Iterable
+
+from sqlalchemy import Connection, and_, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config.settings import ME_TEAM
+from models.scores import Base, Service, ServiceHistory, Team
+from models.series import PackedSeries, ServiceSeries, chunk_of
+
+
+def join_chunks(
+    series_class: type[PackedSeries], rows: Iterable[tuple]
+) -> dict[object, PackedSeries]:
+    """Put the chunks of every series back together.
+
+    Args:
+        series_class: The PackedSeries subclass of the rows.
+        rows: (key, first_round_id, *blobs), the chunks of a key in order.
+    """
+    series: dict[object, PackedSeries] = {}
+    for key, *blobs in rows:
+        chunk = series_class.from_blobs(*blobs)
+        if key in series:
+            series[key].extend(chunk)
+        else:
+            series[key] = chunk
+    return series
+
+
+def read_service_history(
+    connection: Connection | Session, team: str = ME_TEAM, after_round_id: int = 0
+) -> dict[str, ServiceSeries]:
+    """The history of every service of a team by name.
+
+    Args:
+        connection: Connection to the score database.
+        team: Name of the team.
+        after_round_id: Only the chunks with rounds after this one are read,
+            so the series may start earlier but hold every round after it.
+    """
+    team_id = select(Team.id).where(Team.name == team).scalar_subquery()
+    stmt = select(
+        Service.name,
+        ServiceHistory.first_round_id,
+        ServiceHistory.offense,
+        ServiceHistory.defence,
+        ServiceHistory.status,
+    ).join(Service, Service.id == ServiceHistory.service_id).where(
+        ServiceHistory.team_id == team_id,
+        ServiceHistory.chunk >= chunk_of(after_round_id + 1),
+    ).order_by(ServiceHistory.service_id, ServiceHistory.chunk)
+    return join_chunks(ServiceSeries, connection.execute(stmt))
+
+
+class HistoryStore:
+    """Writes a table of series (see models/series.py), a row per chunk of
+    a series, keeping the latest chunk of every series in memory so
+    appending a round doesn't have to read it back first. A round only
+    rewrites the latest chunks, so what's written per round doesn't grow
+    with the game.
+
+    Subclasses set the model of the table, the columns that identify a
+    series besides the chunk, and its PackedSeries subclass. A series is
+    keyed by the value of its key column, or a tuple of them if there are
+    several.
+
+    Only used from the database worker."""
+
+    model: type[Base]
+    key_columns: tuple[str, ...]
+    series_class: type[PackedSeries]
+
+    def __init__(self) -> None:
+        self._series: dict | None = None
+
+    def invalidate(self) -> None:
+        """Forget the in-memory copy, e.g. after a rolled back transaction."""
+        self._series = None
+
+    def _load(self, session: Session) -> dict:
+        if self._series is None:
+            table = self.model.__table__
+            keys = [table.c[name] for name in self.key_columns]
+            latest = (
+                select(*keys, func.max(table.c.chunk).label("chunk"))
+                .group_by(*keys)
+                .subquery()
+            )
+            stmt = select(
+                *keys,
+                table.c.first_round_id,
+                *(table.c[name] for name, _, _ in self.series_class.COLUMNS),
+            ).join(
+                latest,
+                and_(
+                    table.c.chunk == latest.c.chunk,
+                    *(key == latest.c[key.name] for key in keys),
+                ),
+            )
+            count = len(keys)
+            self._series = {
+                row[0] if count == 1 else tuple(row[:count]): (
+                    self.series_class.from_blobs(*row[count:])
+                )
+                for row in session.execute(stmt)
+            }
+        return self._series
+
+    def append_round(self, session: Session, round_id: int, rounds: dict) -> None:
+        """Add a round to the history of the series in it.
+
+        Args:
+            session: Session of the ingest transaction.
+            round_id: The round, not older than any round stored before.
+            rounds: The values of the round, as series_class.set takes them,
+                per series key.
+        """
+        if not rounds:
+            return
+        all_series = self._load(session)
+        chunk = chunk_of(round_id)
+        for key, values in rounds.items():
+            series = all_series.get(key)
+            if series is None or chunk_of(series.first_round_id) != chunk:
+                series = all_series[key] = self.series_class(round_id)
+            series.set(round_id, *values)
+
+        stmt = sqlite_insert(self.model.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[*self.key_columns, "chunk"],
+            set_={
+                column: stmt.excluded[column]
+                for column in (
+                    "first_round_id",
+                    *(name for name, _, _ in self.series_class.COLUMNS),
+                )
+            },
+        )
+        single = len(self.key_columns) == 1
+        session.execute(
+            stmt,
+            [
+                {
+                    **dict(zip(self.key_columns, (key,) if single else key)),
+                    "chunk": chunk,
+                    **all_series[key].to_blobs(),
+                }
+                for key in rounds
+            ],
+        )
+
+
+class SeriesStore(HistoryStore):
+    """Writes service_history, keyed by (team_id, service_id)."""
+
+    model = ServiceHistory
+    key_columns = ("team_id", "service_id")
+    series_class = ServiceSeries
@@ -0,0 +1,42 @@
+"""
+The last state of the dashboard, kept in the database so a restart can
+paint it before SQLAlchemy, httpx and the first fetch are ready.
+
+Reading uses the sqlite3 module directly, as it runs before any of that
+is imported.
+"""
+
+import json
+import sqlite3
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine
+
+
+def read_cached_snapshot(db_path: str) -> dict | None:
+    """The snapshot written last, or None if there is none (yet)."""
+    try:
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        row = connection.execute(
+            "SELECT data FROM dashboard_snapshot WHERE id = 1"
+        ).fetchone()
+    except sqlite3.Error:
+        # A new database, or one that hasn't been migrated yet
+        return None
+    finally:
+        connection.close()
+    return json.loads(row[0]) if row is not None else None
+
+
+def write_cached_snapshot(engine: "Engine", snapshot: dict) -> None:
+    """Store a snapshot in the format of StatsRetriever.get_dashboard_snapshot."""
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO dashboard_snapshot (id, data) VALUES (1, ?) "
+            "ON CONFLICT (id) DO UPDATE SET data = excluded.data",
+            (json.dumps(snapshot),),
+        )
@@ -1,14 +1,50 @@
 from typing import Tuple
 
-from sqlalchemy import Engine, select, ScalarResult
+from sqlalchemy import (
+    Connection,
+    Engine,
+    ScalarResult,
+    ScalarSelect,
+    and_,
+    func,
+    select,
+)
 from sqlalchemy.orm import Session
 
-from models.scores import GameRound, HighscoreAndSLA, ServiceScore
+from config.settings import (
+    LEADERBOARD_RANK_DELTA_ROUNDS,
+    ME_TEAM,
+    SERVICE_HISTORY_ROUNDS,
+    SERVICE_HISTORY_BACKEND,
+)
+from models.scores import (
+    GameRound,
+    HighscoreAndSLA,
+    ServiceScore,
+    Service,
+    ServiceStatus,
+    Team,
+)
+from models.series import ServiceSeries
+from services.dashboard_model import DashboardModel
+from services.leaderboard import read_leaderboard
+from services.metrics import metrics
+from services.series_store import read_service_history
 
 
 class StatsRetriever:
-    def __init__(self, engine: Engine) -> None:
+    def __init__(self, engine: Engine, team: str = ME_TEAM) -> None:
+        """
+        Args:
+            engine: Engine of the score database.
+            team: Team whose services to read, the title and score are always
+                our own.
+        """
         self._engine = engine
+        self._team = team
+
+    def _team_id(self) -> ScalarSelect:
+        return select(Team.id).where(Team.name == self._team).scalar_subquery()
 
     def get_team_name(self) -> str:
         with Session(self._engine) as session:
@@ -28,6 +64,16 @@ class StatsRetriever:
             else:
                 return 0
 
+    def get_round_timestamps(self, limit: int = 50) -> list[str]:
+        """score_timestamp of the latest rounds, oldest first."""
+        with self._engine.connect() as connection:
+            stmt = (
+                select(GameRound.score_timestamp)
+                .order_by(GameRound.id.desc())
+                .limit(limit)
+            )
+            return connection.scalars(stmt).all()[::-1]
+
     def get_current_score_position_sla(self) -> Tuple[int, int, str]:
         game_round_id = self.get_current_round_number()
         with Session(self._engine) as session:
@@ -46,7 +92,8 @@ class StatsRetriever:
             recent_round_number = self.get_current_round_number()
             stmt = (
                 select(ServiceScore)
-                .where(ServiceScore.game_round_id > recent_round_number - 25) # Take 25 samples
+                .where(ServiceScore.team_id == self._team_id())
+                .where(ServiceScore.game_round_id > recent_round_number - SERVICE_HISTORY_ROUNDS)
                 .order_by(ServiceScore.game_round_id)
             )
 
@@ -54,6 +101,11 @@ class StatsRetriever:
             if dataset is None:
                 return {}
             for score in dataset:
+                service_statuses = [
+                    status
+                    for status in score.service.service_statuses
+                    if status.team_id == score.team_id
+                ]
                 if update.get(score.service.name) is None:
                     update[score.service.name] = {"off_series": [], "def_series": []}
                 update[score.service.name]["off_series"].append(score.offense_total)
@@ -63,9 +115,9 @@ class StatsRetriever:
                 update[score.service.name]["off_total"] = score.offense_total
                 update[score.service.name]["def_total"] = score.defence_total
                 update[score.service.name]["status"] = (
-                    score.service.service_statuses[-1].status
-                    if len(score.service.service_statuses) > 1
-                    else score.service.service_statuses[0].status
+                    service_statuses[-1].status
+                    if len(service_statuses) > 1
+                    else service_statuses[0].status
                 )
         # Now we have the series, we need to calculate the differences for all services
         for service in update:
@@ -86,3 +138,215 @@ class StatsRetriever:
             update[service]["def_series"].pop(0)
 
         return update.copy()
+
+    def get_service_history(self) -> dict[str, ServiceSeries]:
+        """The full game history of every service (columnar backend only)."""
+        with self._engine.connect() as connection:
+            return read_service_history(connection, self._team)
+
+    def get_leaderboard(self) -> list[dict]:
+        """Standings of all teams, see read_leaderboard."""
+        with self._engine.connect() as connection:
+            return read_leaderboard(connection, LEADERBOARD_RANK_DELTA_ROUNDS)
+
+    def _read_recent_rounds_from_history(
+        self, connection: Connection, round_id: int
+    ) -> list[Tuple[int, dict]]:
+        rounds: dict[int, dict] = {}
+        after_round_id = round_id - SERVICE_HISTORY_ROUNDS
+        history = read_service_history(connection, self._team, after_round_id)
+        for name, series in history.items():
+            for service_round_id, off_total, def_total, status in series.rounds(
+                after_round_id
+            ):
+                rounds.setdefault(service_round_id, {})[name] = {
+                    "status": status,
+                    "off_total": off_total,
+                    "def_total": def_total,
+                }
+        return sorted(rounds.items())
+
+    def get_recent_service_rounds(self) -> list[Tuple[int, dict]]:
+        """Service scores and statuses of the recent rounds, oldest first, in
+        the form DashboardModel.apply_round takes them."""
+        recent_round_number = self.get_current_round_number()
+        if SERVICE_HISTORY_BACKEND == "columnar":
+            with self._engine.connect() as connection:
+                return self._read_recent_rounds_from_history(
+                    connection, recent_round_number
+                )
+        stmt = (
+            select(
+                ServiceScore.game_round_id,
+                Service.name,
+                ServiceScore.offense_total,
+                ServiceScore.defence_total,
+                ServiceStatus.status,
+            )
+            .join(Service, Service.id == ServiceScore.service_id)
+            .outerjoin(
+                ServiceStatus,
+                and_(
+                    ServiceStatus.team_id == ServiceScore.team_id,
+                    ServiceStatus.service_id == ServiceScore.service_id,
+                    ServiceStatus.game_round_id == ServiceScore.game_round_id,
+                ),
+            )
+            .where(
+                ServiceScore.team_id == self._team_id(),
+                ServiceScore.game_round_id
+                > recent_round_number - SERVICE_HISTORY_ROUNDS,
+            )
+            .order_by(ServiceScore.game_round_id, ServiceScore.id)
+        )
+        rounds = []
+        with Session(self._engine) as session:
+            for round_id, name, off_total, def_total, status in session.execute(stmt):
+                if not rounds or rounds[-1][0] != round_id:
+                    rounds.append((round_id, {}))
+                rounds[-1][1][name] = {
+                    "status": status,
+                    "off_total": off_total,
+                    "def_total": def_total,
+                }
+        return rounds
+
+    @staticmethod
+    def _read_title_and_score(connection: Connection) -> dict:
+        latest_round = select(func.max(GameRound.id).label("round_id")).subquery()
+        team_name = (
+            select(HighscoreAndSLA.me_team)
+            .order_by(HighscoreAndSLA.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = select(
+            latest_round.c.round_id,
+            team_name,
+            HighscoreAndSLA.score,
+            HighscoreAndSLA.position,
+            HighscoreAndSLA.sla,
+        ).select_from(
+            latest_round.outerjoin(
+                HighscoreAndSLA,
+                HighscoreAndSLA.game_round_id == latest_round.c.round_id,
+            )
+        )
+        round_id, team, score, position, sla = connection.execute(stmt).one()
+        if score is None:
+            score, position, sla = 0, 1, "100%"
+        return {
+            "team": team or "unknown",
+            "round": round_id or 0,
+            "score": score,
+            "position": position,
+            "sla": sla,
+        }
+
+    def _read_service_updates(self, connection: Connection, round_id: int) -> dict:
+        if SERVICE_HISTORY_BACKEND == "columnar":
+            dashboard = DashboardModel()
+            for service_round_id, services in self._read_recent_rounds_from_history(
+                connection, round_id
+            ):
+                dashboard.apply_round(service_round_id, services)
+            return dashboard.get_service_updates_dict()
+
+        oldest_round_id = round_id - SERVICE_HISTORY_ROUNDS
+        # Status of the most recent round each service has one for
+        latest_status = (
+            select(
+                ServiceStatus.service_id,
+                ServiceStatus.status,
+                func.row_number()
+                .over(
+                    partition_by=ServiceStatus.service_id,
+                    order_by=(
+                        ServiceStatus.game_round_id.desc(),
+                        ServiceStatus.id.desc(),
+                    ),
+                )
+                .label("recency"),
+            )
+            .where(
+                ServiceStatus.team_id == self._team_id(),
+                ServiceStatus.game_round_id > oldest_round_id,
+            )
+            .subquery()
+        )
+        previous = {
+            "partition_by": ServiceScore.service_id,
+            "order_by": (ServiceScore.game_round_id, ServiceScore.id),
+        }
+        stmt = (
+            select(
+                Service.name,
+                ServiceScore.offense_total,
+                ServiceScore.defence_total,
+                ServiceScore.offense_total
+                - func.lag(ServiceScore.offense_total).over(**previous),
+                ServiceScore.defence_total
+                - func.lag(ServiceScore.defence_total).over(**previous),
+                latest_status.c.status,
+            )
+            .join(Service, Service.id == ServiceScore.service_id)
+            .outerjoin(
+                latest_status,
+                and_(
+                    latest_status.c.service_id == ServiceScore.service_id,
+                    latest_status.c.recency == 1,
+                ),
+            )
+            .where(
+                ServiceScore.team_id == self._team_id(),
+                ServiceScore.game_round_id > oldest_round_id,
+            )
+            .order_by(ServiceScore.game_round_id, ServiceScore.id)
+        )
+
+        update = {}
+        for name, off_total, def_total, off_diff, def_diff, status in connection.execute(
+            stmt
+        ):
+            service = update.get(name)
+            if service is None:
+                # The first round in the window only serves as base for the diffs
+                update[name] = {
+                    "off_series": [],
+                    "def_series": [],
+                    "off_diff": [],
+                    "def_diff": [],
+                    "off_total": off_total,
+                    "def_total": def_total,
+                    "status": status,
+                }
+                continue
+            service["off_series"].append(off_total)
+            service["def_series"].append(def_total)
+            service["off_diff"].append(off_diff)
+            service["def_diff"].append(def_diff)
+            service["off_total"] = off_total
+            service["def_total"] = def_total
+        return update
+
+    def get_dashboard_snapshot(self, include_services: bool = True) -> dict:
+        """Everything the dashboard shows, read in one transaction.
+
+        Returns:
+            A dict with team, round, score, position, sla and leaderboard
+            (see get_leaderboard), plus services in the format of
+            get_service_updates_dict if include_services."""
+        with (
+            metrics.timer("query.snapshot_ms"),
+            self._engine.connect() as connection,
+            connection.begin(),
+        ):
+            snapshot = self._read_title_and_score(connection)
+            snapshot["leaderboard"] = read_leaderboard(
+                connection, LEADERBOARD_RANK_DELTA_ROUNDS
+            )
+            if include_services:
+                snapshot["services"] = self._read_service_updates(
+                    connection, snapshot["round"]
+                )
+        return snapshot
@@ -0,0 +1,75 @@
+"""
+Trend classes of the service score digits, for a list of services in one
+call, so the app and ServiceRow share the same rules.
+
+A trend compares the last score diff with the average of the diffs before
+it, over the last TREND_LENGTH_ROUNDS diffs, and maps the difference in
+percent onto the threshold bands from the settings.
+"""
+
+from bisect import bisect_right
+from typing import Iterable, List
+
+from config import settings
+
+# Class per band: below "low", from "low", from "medium", from "high"
+_OFFENSIVE_CLASSES = ("cNONE", "cERROR", "cWARNING", "cOK")
+_DEFENSIVE_CLASSES = ("cNONE", "cOK", "cWARNING", "cERROR")
+
+
+def classify_trends(all_series: Iterable[List[int]], offense: bool) -> List[str]:
+    """The trend class of every series.
+
+    Args:
+        all_series: Per service its score diffs, oldest first.
+        offense: Use the offensive instead of the defensive thresholds.
+
+    Returns:
+        A class name per series, in the same order.
+    """
+    thresholds = (
+        settings.OFFENSIVE_SCORE_THRESHOLDS
+        if offense
+        else settings.DEFENSIVE_SCORE_THRESHOLDS
+    )
+    bands = [thresholds["low"], thresholds["medium"], thresholds["high"]]
+    class_names = _OFFENSIVE_CLASSES if offense else _DEFENSIVE_CLASSES
+    length = settings.TREND_LENGTH_ROUNDS
+
+    classes = []
+    for series in all_series:
+        selection = series[-length:]
+        count = len(selection)
+        # Can't measure trend over 1 item. Can't divide by zero.
+        if count < 2 or selection[0] == 0:
+            classes.append("cNONE")
+            continue
+        last_score = selection[-1]
+        average_of_previous = (sum(selection) - last_score) / (count - 1)
+        if average_of_previous == 0:
+            classes.append("cNONE")
+            continue
+        difference_percent = (
+            abs((average_of_previous - last_score) / average_of_previous) * 100
+        )
+        classes.append(class_names[bisect_right(bands, difference_percent)])
+    return classes
+
+
+def add_trend_classes(service_updates: dict) -> dict:
+    """Add off_class and def_class to every service of a service updates dict.
+
+    Returns:
+        The same dict, for chaining.
+    """
+    services = list(service_updates.values())
+    for key, diff_key, offense in (
+        ("off_class", "off_diff", True),
+        ("def_class", "def_diff", False),
+    ):
+        classes = classify_trends(
+            (service[diff_key] for service in services), offense=offense
+        )
+        for service, class_name in zip(services, classes):
+            service[key] = class_name
+    return service_updates
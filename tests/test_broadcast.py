@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+from services.broadcast import SnapshotBroadcaster
+
+
+async def _connect(broadcaster: SnapshotBroadcaster):
+    return await asyncio.open_connection("127.0.0.1", broadcaster.port)
+
+
+def test_viewers_get_snapshots():
+    async def run() -> None:
+        broadcaster = SnapshotBroadcaster()
+        await broadcaster.start("127.0.0.1", 0)
+        try:
+            reader, writer = await _connect(broadcaster)
+            while broadcaster.viewers == 0:
+                await asyncio.sleep(0.01)
+            broadcaster.publish({"round": 1})
+            message = json.loads(await asyncio.wait_for(reader.readline(), 5))
+            assert message["snapshot"] == {"round": 1}
+            writer.close()
+        finally:
+            await broadcaster.close()
+
+    asyncio.run(run())
+
+
+def test_connections_that_send_data_are_closed():
+    async def run() -> None:
+        broadcaster = SnapshotBroadcaster()
+        await broadcaster.start("127.0.0.1", 0)
+        try:
+            reader, writer = await _connect(broadcaster)
+            # Far more than is ever read from a connection
+            writer.write(b"x" * 1024 * 1024)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            try:
+                assert await asyncio.wait_for(reader.read(), 5) == b""
+            except ConnectionResetError:
+                # Closed with our data still unread
+                pass
+            while broadcaster.viewers:
+                await asyncio.sleep(0.01)
+            writer.close()
+        finally:
+            await broadcaster.close()
+
+    asyncio.run(run())
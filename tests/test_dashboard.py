@@ -0,0 +1,42 @@
+import asyncio
+
+from textual.app import App, ComposeResult
+
+from widgets.dashboard import Dashboard
+from widgets.service_row import ServiceRow
+
+SERVICE_UPDATES = {
+    f"service-{index}": {
+        "status": "OK",
+        "off_total": index,
+        "def_total": index,
+        "off_diff": [1, 2],
+        "def_diff": [2, 1],
+        "off_series": [1, 2, 3],
+        "def_series": [3, 2, 1],
+    }
+    for index in range(5)
+}
+
+
+class _DashboardApp(App):
+    def compose(self) -> ComposeResult:
+        yield Dashboard()
+
+
+def test_overlapping_updates_while_rows_mount():
+    async def run() -> None:
+        app = _DashboardApp()
+        async with app.run_test() as pilot:
+            dashboard = app.query_one(Dashboard)
+            first = asyncio.create_task(dashboard._update_service_rows(SERVICE_UPDATES))
+            await asyncio.sleep(0)
+            # As a poll of another scoreboard would, before the rows are laid out
+            assert dashboard.sparkline_width == 0
+            await dashboard._update_service_rows(SERVICE_UPDATES)
+            await first
+            await pilot.pause()
+            assert len(dashboard.query(ServiceRow)) == len(SERVICE_UPDATES)
+            assert dashboard.sparkline_width > 0
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+import pytest
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from services.dashboard_model import DashboardModel
+from services.db_worker import DatabaseWorker
+from services.score_store import ScoreStoreService
+from services.stats_retriever import StatsRetriever
+from tools.fake_scoreboard import generate_game
+
+ROUNDS = 40
+# Only on the scoreboard from this round on
+LATE_SERVICE = "service-3"
+LATE_SERVICE_ROUND = 10
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(str(tmp_path / "scores.sqlite3"))
+    prepare_database(engine)
+    yield engine
+    engine.dispose()
+
+
+def _game() -> list[dict]:
+    game = generate_game(teams=3, services=4, rounds=ROUNDS, me_team="xren")
+    for scoreboard in game[: LATE_SERVICE_ROUND - 1]:
+        for team in scoreboard["success"]["highscore"]:
+            del team["services"][LATE_SERVICE]
+    return game
+
+
+def test_same_output_as_the_database_after_every_round(engine):
+    db_worker = DatabaseWorker()
+    score_store = ScoreStoreService(engine, db_worker, me_team="xren")
+    stats_retriever = StatsRetriever(engine, "xren")
+    dashboard = DashboardModel()
+    try:
+        for round_number, scoreboard in enumerate(_game(), 1):
+            assert score_store.ingest_scoreboard(scoreboard["success"])
+            dashboard.apply_round(*score_store.latest_round)
+
+            expected = stats_retriever.get_service_updates_dict()
+            actual = dashboard.get_service_updates_dict()
+            assert actual == expected, f"round {round_number}"
+            assert list(actual) == list(expected), f"round {round_number}"
+            assert (LATE_SERVICE in actual) == (round_number >= LATE_SERVICE_ROUND)
+    finally:
+        db_worker.shutdown()
+
+
+def test_starting_from_the_stored_history(engine):
+    db_worker = DatabaseWorker()
+    score_store = ScoreStoreService(engine, db_worker, me_team="xren")
+    stats_retriever = StatsRetriever(engine, "xren")
+    try:
+        for round_number, scoreboard in enumerate(_game(), 1):
+            score_store.ingest_scoreboard(scoreboard["success"])
+            # A dashboard (re)started after this round
+            dashboard = DashboardModel()
+            dashboard.load_history(
+                stats_retriever.get_service_history(),
+                stats_retriever.get_current_round_number(),
+            )
+            assert (
+                dashboard.get_service_updates_dict()
+                == stats_retriever.get_service_updates_dict()
+            ), f"round {round_number}"
+    finally:
+        db_worker.shutdown()
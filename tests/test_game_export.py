@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import func, select
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from models.scores import GameRound, Service, Team
+from services import retention
+from services.db_worker import DatabaseWorker
+from services.game_export import export_game, import_game
+from services.retention import RetentionService
+from services.score_store import ScoreStoreService
+from tools.fake_scoreboard import generate_game
+
+
+def _new_engine(path: str):
+    engine = create_db_engine(path)
+    prepare_database(engine)
+    return engine
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    engine = _new_engine(str(tmp_path / "scores.sqlite3"))
+    db_worker = DatabaseWorker()
+    try:
+        score_store = ScoreStoreService(engine, db_worker, me_team="xren")
+        for scoreboard in generate_game(teams=3, services=2, rounds=5, me_team="xren"):
+            score_store.ingest_scoreboard(scoreboard["success"])
+    finally:
+        db_worker.shutdown()
+    yield engine
+    engine.dispose()
+
+
+def _count(engine, model) -> int:
+    with engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(model))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "columns"])
+def test_round_trip(engine, tmp_path, fmt):
+    exported = export_game(engine, str(tmp_path / "export"), fmt)
+    imported_engine = _new_engine(str(tmp_path / "imported.sqlite3"))
+    try:
+        assert import_game(imported_engine, str(tmp_path / "export")) == exported
+        assert _count(imported_engine, GameRound) == 5
+    finally:
+        imported_engine.dispose()
+
+
+def test_refuses_an_archived_database(engine, tmp_path):
+    export_game(engine, str(tmp_path / "export"), "csv")
+    RetentionService(engine).archive_game()
+    # Archiving leaves the teams and services behind
+    assert _count(engine, GameRound) == 0
+    assert _count(engine, Team) and _count(engine, Service)
+
+    with pytest.raises(ValueError, match="empty database"):
+        import_game(engine, str(tmp_path / "export"))
+    assert _count(engine, GameRound) == 0
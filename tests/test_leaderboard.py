@@ -0,0 +1,63 @@
+import pytest
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from models.series import CHUNK_ROUNDS
+from services.db_worker import DatabaseWorker
+from services.leaderboard import Leaderboard, read_leaderboard
+from services.score_store import ScoreStoreService
+from tools.fake_scoreboard import generate_game
+
+ROUNDS = 2 * CHUNK_ROUNDS + 20
+
+
+@pytest.fixture
+def game():
+    return generate_game(teams=6, services=1, rounds=ROUNDS, me_team="xren")
+
+
+@pytest.fixture
+def engine(tmp_path, game):
+    engine = create_db_engine(str(tmp_path / "scores.sqlite3"))
+    prepare_database(engine)
+    db_worker = DatabaseWorker()
+    try:
+        score_store = ScoreStoreService(engine, db_worker, me_team="xren")
+        for scoreboard in game:
+            assert score_store.ingest_scoreboard(scoreboard["success"])
+    finally:
+        db_worker.shutdown()
+    yield engine
+    engine.dispose()
+
+
+def _standings(scoreboard: dict) -> Leaderboard:
+    leaderboard = Leaderboard()
+    leaderboard.update(
+        {unit["name"]: unit["scores"][-1] for unit in scoreboard["success"]["highscore"]}
+    )
+    return leaderboard
+
+
+@pytest.mark.parametrize("delta_rounds", [1, 10, CHUNK_ROUNDS, CHUNK_ROUNDS + 30])
+def test_ranks_and_deltas(engine, game, delta_rounds):
+    latest = _standings(game[-1])
+    old_ranks = {
+        name: rank for rank, name, _ in _standings(game[-1 - delta_rounds]).standings()
+    }
+    expected = []
+    for rank, name, score in latest.standings():
+        gap_above, gap_below = latest.gaps(name)
+        expected.append(
+            {
+                "rank": rank,
+                "team": name,
+                "score": score,
+                "rank_delta": old_ranks[name] - rank,
+                "gap_above": gap_above,
+                "gap_below": gap_below,
+            }
+        )
+
+    with engine.connect() as connection:
+        assert read_leaderboard(connection, delta_rounds) == expected
@@ -0,0 +1,34 @@
+import sys
+import threading
+
+from services.metrics import Metrics
+
+
+def test_no_lost_updates_across_threads():
+    metrics = Metrics()
+    threads, updates = 8, 50_000
+    start = threading.Barrier(threads)
+
+    def record() -> None:
+        start.wait()
+        for _ in range(updates):
+            metrics.increment("db.queries")
+        for _ in range(updates):
+            metrics.observe("db.query_ms", 1.0)
+
+    # Switch threads as often as possible, to interleave the updates
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        workers = [threading.Thread(target=record) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["db.queries"] == threads * updates
+    assert snapshot["histograms"]["db.query_ms"]["count"] == threads * updates
+    assert snapshot["histograms"]["db.query_ms"]["sum"] == threads * updates
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+from sqlalchemy import func, select
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from models.scores import GameRound, ServiceHistory
+from services import retention
+from services.db_worker import DatabaseWorker
+from services.retention import RetentionService
+from services.score_store import ScoreStoreService
+from tools.fake_scoreboard import generate_game
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "ARCHIVE_DIR", str(tmp_path / "archive"))
+    engine = create_db_engine(str(tmp_path / "scores.sqlite3"))
+    prepare_database(engine)
+    db_worker = DatabaseWorker()
+    try:
+        score_store = ScoreStoreService(engine, db_worker, me_team="xren")
+        for scoreboard in generate_game(teams=3, services=2, rounds=5, me_team="xren"):
+            score_store.ingest_scoreboard(scoreboard["success"])
+    finally:
+        db_worker.shutdown()
+    yield engine
+    engine.dispose()
+
+
+def _count(engine, model) -> int:
+    with engine.connect() as connection:
+        return connection.scalar(select(func.count()).select_from(model))
+
+
+def test_archive_game(engine):
+    path = RetentionService(engine).archive_game()
+
+    assert os.path.dirname(path) == retention.ARCHIVE_DIR
+    archived = create_db_engine(path)
+    assert _count(archived, GameRound) == 5
+    assert _count(archived, ServiceHistory) > 0
+    archived.dispose()
+    assert _count(engine, GameRound) == 0
+    assert _count(engine, ServiceHistory) == 0
+    # Nothing left to archive
+    assert RetentionService(engine).archive_game() is None
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from models.scores import HighscoreAndSLA
+from services import score_store
+from services.db_worker import DatabaseWorker
+from services.score_store import ScoreStoreService
+from tools.fake_scoreboard import generate_game
+
+URL = "http://scoreboard.test/scores"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(str(tmp_path / "scores.sqlite3"))
+    prepare_database(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def parsed_full_history(monkeypatch):
+    """full_history of every streaming parser made, in order."""
+    made = []
+    parser_class = score_store.ScoreboardStreamParser
+
+    def parser(teams=None, full_history=False):
+        made.append(full_history)
+        return parser_class(teams=teams, full_history=full_history)
+
+    monkeypatch.setattr(score_store, "ScoreboardStreamParser", parser)
+    return made
+
+
+def test_full_history_only_after_possible_gaps(
+    engine, parsed_full_history, monkeypatch
+):
+    monkeypatch.setattr(score_store, "HTTP_RETRY_BACKOFF_S", 0)
+    game = generate_game(teams=4, services=2, rounds=8, me_team="xren")
+    # Index of the scoreboard served, None for a server error
+    served = [0, 1, 2, None, 5, 6, 7]
+
+    async def run() -> list[bool]:
+        def handler(request: httpx.Request) -> httpx.Response:
+            index = served[serving]
+            if index is None:
+                return httpx.Response(503)
+            return httpx.Response(200, content=json.dumps(game[index]).encode())
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        db_worker = DatabaseWorker()
+        store = ScoreStoreService(engine, db_worker, me_team="xren", client=client)
+        updated = []
+        try:
+            for serving in range(len(served)):
+                # The last time as if the round clock says a round went by
+                updated.append(
+                    await store.get_scores(
+                        URL, may_have_missed_rounds=serving == len(served) - 1
+                    )
+                )
+        finally:
+            await client.aclose()
+            db_worker.shutdown()
+        return updated
+
+    updated = asyncio.run(run())
+
+    assert updated == [True, True, True, False, True, True, True]
+    # On startup, after the error and when told rounds may have been missed
+    assert parsed_full_history == [True, False, False, True, False, True]
+    with engine.connect() as connection:
+        labels = connection.scalars(
+            select(HighscoreAndSLA.label).order_by(HighscoreAndSLA.game_round_id)
+        ).all()
+    # Rounds 3 and 4 were backfilled
+    assert labels == [
+        scoreboard["success"]["highscore_labels"][-1] for scoreboard in game
+    ]
@@ -0,0 +1,118 @@
+import json
+import random
+
+import pytest
+
+from services.scoreboard_parser import ScoreboardStreamParser
+from tools.fake_scoreboard import generate_game
+
+TEAMS = {"xren", 'we "quote"'}
+
+
+def _tricky_document() -> dict:
+    """Strings that look like JSON, escapes, non-ASCII and nesting around
+    and inside what the parser picks out."""
+    return {
+        "before": {"highscore": [{"name": "not a team"}], "x": ["]", "}", "\\"]},
+        "success": {
+            "title": 'braces { [ ] } and "quotes" \\ in a string',
+            # An odd number of escaped quotes before brackets
+            "motd": 'say "{ or [',
+            '"highscore"': [{"name": "a key with quotes"}],
+            "highscore": [
+                {
+                    "name": "xren",
+                    "sla": "99.5%",
+                    "scores": [1, 2, 3],
+                    "services": {
+                        "web": {"status": "OK", "capture": 1, "lost": 0},
+                        "ünïcode ☃ 😀": {
+                            "status": "FC",
+                            "capture": 2,
+                            "lost": [{"nested": {"deep": [[]]}}],
+                        },
+                    },
+                },
+                {
+                    "name": 'we "quote"',
+                    "scores": [],
+                    "services": {"a\\b\n\t": {"status": "}]\"{["}},
+                    "extra": {"highscore_labels": ["not", "these"]},
+                },
+                {"name": "untracked", "sla": "", "scores": [7], "services": {"x": {}}},
+                {"name": "no scores or services"},
+            ],
+            "highscore_labels": ["12:00", "12:01", "éé:\"\\"],
+            "after": [{"highscore": []}],
+        },
+        "trailing": "☃",
+    }
+
+
+def _documents() -> list[dict]:
+    game = generate_game(teams=5, services=3, rounds=12, me_team="xren")
+    return [_tricky_document(), game[0], game[-1]]
+
+
+def _expected(document: dict, full_history: bool) -> dict:
+    success = document["success"]
+    kept = slice(None if full_history else -1, None)
+    return {
+        "highscore": [
+            {
+                "name": unit.get("name"),
+                "sla": unit.get("sla", ""),
+                "scores": unit.get("scores", [])[kept],
+                "services": (
+                    unit.get("services", {}) if unit.get("name") in TEAMS else {}
+                ),
+            }
+            for unit in success["highscore"]
+        ],
+        "highscore_labels": success["highscore_labels"][kept],
+    }
+
+
+def _encode(document: dict, indent: int | None, ensure_ascii: bool) -> bytes:
+    return json.dumps(document, indent=indent, ensure_ascii=ensure_ascii).encode()
+
+
+def _parse(body: bytes, splits: list[int], full_history: bool) -> dict:
+    parser = ScoreboardStreamParser(teams=TEAMS, full_history=full_history)
+    start = 0
+    for end in splits + [len(body)]:
+        parser.feed(body[start:end])
+        start = end
+    return parser.result()
+
+
+@pytest.mark.parametrize("full_history", [True, False])
+@pytest.mark.parametrize("indent", [None, 2])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_random_chunks_match_json_loads(full_history, indent, ensure_ascii):
+    rng = random.Random(0)
+    for document in _documents():
+        body = _encode(document, indent, ensure_ascii)
+        # Sanity check of the oracle itself
+        assert json.loads(body) == document
+        expected = _expected(document, full_history)
+        assert _parse(body, [], full_history) == expected
+        for _ in range(30):
+            # Many small chunks split strings, escapes and UTF-8 sequences
+            splits = sorted(rng.sample(range(1, len(body)), rng.randrange(1, 60)))
+            assert _parse(body, splits, full_history) == expected
+
+
+def test_every_byte_a_chunk():
+    body = _encode(_tricky_document(), indent=None, ensure_ascii=False)
+    splits = list(range(1, len(body)))
+    assert _parse(body, splits, True) == _expected(_tricky_document(), True)
+
+
+@pytest.mark.parametrize("cut", ['"scores": [1, 2', '"web": {"status"', '"12:01"'])
+def test_truncated_body(cut):
+    body = _encode(_tricky_document(), indent=None, ensure_ascii=False)
+    truncated = body[: body.index(cut.encode()) + len(cut)]
+    for splits in [[], list(range(1, len(truncated), 7))]:
+        with pytest.raises(ValueError, match="halfway"):
+            _parse(truncated, splits, True)
@@ -0,0 +1,151 @@
+from array import array
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from models.database import create_db_engine
+from models.migrations import MIGRATIONS, _chunk_service_history, prepare_database
+from models.scores import Service, ServiceHistory, Team, TeamHistory
+from models.series import CHUNK_ROUNDS, MISSING, ServiceSeries, TeamSeries
+from services.series_store import SeriesStore, join_chunks, read_service_history
+
+ROUNDS = 3 * CHUNK_ROUNDS + 10
+# Rounds the first service is off the scoreboard, a whole chunk of them
+GAP = range(CHUNK_ROUNDS - 5, 2 * CHUNK_ROUNDS + 5)
+# The second service only shows up in this round
+LATE_ROUND = CHUNK_ROUNDS + 20
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_db_engine(str(tmp_path / "scores.sqlite3"))
+    prepare_database(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Team), [{"id": 1, "name": "xren"}])
+        connection.execute(
+            insert(Service), [{"id": 1, "name": "first"}, {"id": 2, "name": "late"}]
+        )
+    yield engine
+    engine.dispose()
+
+
+def _rounds():
+    """(round_id, scores) as SeriesStore.append_round takes them."""
+    for round_id in range(1, ROUNDS + 1):
+        scores = {}
+        if round_id not in GAP:
+            scores[1, 1] = (round_id * 10, round_id, "OK")
+        if round_id >= LATE_ROUND:
+            scores[1, 2] = (round_id * 20, 0, "FC")
+        yield round_id, scores
+
+
+def _expected() -> dict[str, ServiceSeries]:
+    expected = {"first": ServiceSeries(1), "late": ServiceSeries(LATE_ROUND)}
+    for round_id, scores in _rounds():
+        for (_, service_id), values in scores.items():
+            expected[["first", "late"][service_id - 1]].set(round_id, *values)
+    return expected
+
+
+def _assert_same(history: dict[str, ServiceSeries], expected: dict) -> None:
+    assert history.keys() == expected.keys()
+    for name, series in history.items():
+        assert list(series.rounds()) == list(expected[name].rounds()), name
+
+
+def test_chunks_put_back_together():
+    series = _expected()["first"]
+    chunks = list(series.chunks())
+    # The gap covers the whole second chunk
+    assert [chunk for chunk, _ in chunks] == [0, 2, 3]
+    joined = ServiceSeries(0)
+    for _, chunk in chunks:
+        joined.extend(chunk)
+    assert joined.first_round_id == series.first_round_id
+    assert joined.offense == series.offense
+    assert joined.defence == series.defence
+    assert joined.status == series.status
+
+
+def test_a_round_only_writes_its_chunk(engine):
+    store = SeriesStore()
+    for round_id, scores in _rounds():
+        with Session(engine) as session, session.begin():
+            store.append_round(session, round_id, scores)
+        if round_id == CHUNK_ROUNDS * 2:
+            # As after a restart, which loads the latest chunks again
+            store.invalidate()
+
+    with engine.connect() as connection:
+        _assert_same(read_service_history(connection, "xren"), _expected())
+        longest = connection.scalar(select(func.max(func.length(ServiceHistory.offense))))
+        assert longest <= CHUNK_ROUNDS * array("q").itemsize
+
+        recent = read_service_history(connection, "xren", after_round_id=ROUNDS - 5)
+    for name, series in recent.items():
+        assert list(series.rounds(ROUNDS - 5)) == list(
+            _expected()[name].rounds(ROUNDS - 5)
+        )
+
+
+def test_migrating_whole_game_blobs(engine):
+    expected = _expected()
+    team = TeamSeries(1)
+    for round_id in range(1, ROUNDS + 1):
+        if round_id not in GAP:
+            team.set(round_id, round_id * 100, round_id % 3 + 1)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE service_history")
+        connection.exec_driver_sql(
+            "CREATE TABLE service_history ("
+            "team_id INTEGER NOT NULL, service_id INTEGER NOT NULL, "
+            "first_round_id INTEGER NOT NULL, offense BLOB NOT NULL, "
+            "defence BLOB NOT NULL, status BLOB NOT NULL, "
+            "PRIMARY KEY (team_id, service_id))"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO service_history VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (1, service_id, *expected[name].to_blobs().values())
+                for service_id, name in [(1, "first"), (2, "late")]
+            ],
+        )
+        connection.exec_driver_sql("DROP TABLE team_history")
+        connection.exec_driver_sql(
+            "CREATE TABLE team_history ("
+            "team_id INTEGER NOT NULL PRIMARY KEY, first_round_id INTEGER NOT NULL, "
+            "score BLOB NOT NULL, rank BLOB NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO team_history VALUES (1, ?, ?, ?)",
+            tuple(team.to_blobs().values()),
+        )
+        version = MIGRATIONS.index(_chunk_service_history)
+        connection.exec_driver_sql(f"PRAGMA user_version = {version}")
+    assert MISSING in expected["first"].offense
+
+    prepare_database(engine)
+
+    with engine.connect() as connection:
+        _assert_same(read_service_history(connection, "xren"), expected)
+        migrated = join_chunks(
+            TeamSeries,
+            connection.execute(
+                select(
+                    TeamHistory.team_id,
+                    TeamHistory.first_round_id,
+                    TeamHistory.score,
+                    TeamHistory.rank,
+                ).order_by(TeamHistory.team_id, TeamHistory.chunk)
+            ),
+        )
+    assert migrated[1].to_blobs() == team.to_blobs()
+    # And it carries on from the migrated chunks
+    store = SeriesStore()
+    with Session(engine) as session, session.begin():
+        store.append_round(session, ROUNDS + 1, {(1, 1): (1, 2, "OK")})
+    expected["first"].set(ROUNDS + 1, 1, 2, "OK")
+    with engine.connect() as connection:
+        _assert_same(read_service_history(connection, "xren"), expected)
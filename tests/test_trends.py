@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from config import settings
+from services.trends import add_trend_classes, classify_trends
+
+
+def _old_class_name(score_series: list, offense: bool) -> str:
+    """ServiceRow._get_class_name_from_series before classify_trends."""
+    selection = score_series[-settings.TREND_LENGTH_ROUNDS :]
+    # Can't measure trend over 1 item. Can't divide by zero.
+    if len(selection) == 0 or len(selection) == 1 or selection[0] == 0:
+        return "cNONE"
+    average_of_previous = sum(selection[0:-1]) / len(selection[0:-1])
+    last_score = selection[-1]
+    difference_percent = abs((average_of_previous - last_score) / average_of_previous) * 100
+    if offense:
+        if difference_percent >= settings.OFFENSIVE_SCORE_THRESHOLDS["high"]:
+            return "cOK"
+        elif difference_percent >= settings.OFFENSIVE_SCORE_THRESHOLDS["medium"]:
+            return "cWARNING"
+        elif difference_percent >= settings.OFFENSIVE_SCORE_THRESHOLDS["low"]:
+            return "cERROR"
+    else:
+        if difference_percent >= settings.DEFENSIVE_SCORE_THRESHOLDS["high"]:
+            return "cERROR"
+        elif difference_percent >= settings.DEFENSIVE_SCORE_THRESHOLDS["medium"]:
+            return "cWARNING"
+        elif difference_percent >= settings.DEFENSIVE_SCORE_THRESHOLDS["low"]:
+            return "cOK"
+    return "cNONE"
+
+
+def _random_series() -> list[list[int]]:
+    rng = random.Random(0)
+    all_series = []
+    for _ in range(2000):
+        length = rng.randrange(0, 2 * settings.TREND_LENGTH_ROUNDS)
+        high = rng.choice([1, 3, 20, 500])
+        all_series.append([rng.randrange(0, high) for _ in range(length)])
+    return all_series
+
+
+EDGE_CASES = [
+    [],
+    [7],
+    [0, 7],
+    [0, 5, 5, 5, 5],
+    # The diff before the window is 0, but not the first one in it
+    [0, 3, 3, 3, 3, 3],
+    [5, 5, 5, 5, 5],
+    [5, 5, 5, 5, 0],
+    [1, 2],
+    # Exactly on the offensive and defensive thresholds
+    [100, 100, 100, 100, 25],
+    [100, 100, 100, 100, 5],
+    [100, 100, 100, 100, 50],
+    [100, 100, 100, 100, 75],
+    [100, 100, 100, 100, 100],
+]
+
+
+@pytest.mark.parametrize("offense", [True, False])
+def test_same_classes_as_before(offense):
+    all_series = _random_series() + EDGE_CASES
+    expected = [_old_class_name(series, offense) for series in all_series]
+    assert classify_trends(all_series, offense) == expected
+    # Generators work too
+    assert classify_trends(iter(all_series), offense) == expected
+
+
+@pytest.mark.parametrize("offense", [True, False])
+def test_previous_diffs_averaging_to_zero(offense):
+    # The old code divided by zero here
+    series = [4, -4, 2]
+    with pytest.raises(ZeroDivisionError):
+        _old_class_name(series, offense)
+    assert classify_trends([series], offense) == ["cNONE"]
+
+
+def test_add_trend_classes():
+    all_series = _random_series()[:50]
+    service_updates = {
+        f"service-{index}": {"off_diff": series, "def_diff": series[::-1]}
+        for index, series in enumerate(all_series)
+    }
+    assert add_trend_classes(service_updates) is service_updates
+    for service in service_updates.values():
+        assert service["off_class"] == _old_class_name(service["off_diff"], True)
+        assert service["def_class"] == _old_class_name(service["def_diff"], False)
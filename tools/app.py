@@ -0,0 +1,18 @@
+"""
+Loads the app class for the tools, without anything else they import.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+APP_PATH = Path(__file__).parent.parent / "cybernet-scoring-system.py"
+
+
+def load_app_class() -> type:
+    """The app lives in a script whose name isn't importable."""
+    spec = importlib.util.spec_from_file_location("cybernet_scoring_system", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module.CybernetScoringSystem
@@ -0,0 +1,360 @@
+"""
+Export games for analysis, and import them again.
+
+``uv run python -m tools.export export db/archive/*.sqlite3 --out exports``
+writes a directory per game, with a file per table, see
+services/game_export.py for the formats (--format csv or columns).
+
+``uv run python -m tools.export import exports/game-20250101-120000 --db copy.sqlite3``
+loads one into a new database.
+
+``uv run python -m tools.export benchmark --games 3 --rounds 500``
+builds a synthetic archive of games, with the services of every team, and
+compares exporting it through the ORM models, the way the scores were read
+so far, with both export formats, and imports every export again.
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+from urllib.parse import quote
+
+from sqlalchemy import Engine, create_engine, func, insert, select
+from sqlalchemy.orm import Session
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from models.scores import (
+    GameRound,
+    HighscoreAndSLA,
+    Service,
+    ServiceHistory,
+    ServiceScore,
+    ServiceStatus,
+    Team,
+    TeamHistory,
+)
+from models.series import STATUS_CODES, ServiceSeries, TeamSeries
+from services.game_export import FORMATS, GAME_TABLES, export_game, import_game
+
+
+def _game_name(db_path: str) -> str:
+    return os.path.basename(db_path).removesuffix(".sqlite3")
+
+
+def _open_archive(path: str) -> Engine:
+    """Read-only engine for an archive.
+
+    Without the storage profile of create_db_engine, which would switch the
+    archive to WAL and leave -wal and -shm files next to it.
+    """
+    return create_engine(f"sqlite:///file:{quote(path)}?mode=ro&uri=true")
+
+
+def build_game(path: str, rounds: int, teams: int, services: int, seed: int) -> None:
+    """A database with a synthetic game, as if every team was tracked."""
+    rng = random.Random(seed)
+    # Like an archive VACUUM INTO writes, without the storage profile
+    engine = create_engine(f"sqlite:///{path}")
+    prepare_database(engine)
+    statuses = list(STATUS_CODES)
+    team_ids = range(1, teams + 1)
+    service_ids = range(1, services + 1)
+    totals = {(team, service): [0, 0] for team in team_ids for service in service_ids}
+    scores = {team: 0 for team in team_ids}
+    service_series = {key: ServiceSeries(1) for key in totals}
+    team_series = {team: TeamSeries(1) for team in team_ids}
+    with engine.begin() as connection:
+        connection.execute(
+            insert(Team), [{"id": team, "name": f"team-{team}"} for team in team_ids]
+        )
+        connection.execute(
+            insert(Service),
+            [{"id": service, "name": f"service-{service}"} for service in service_ids],
+        )
+        for round_id in range(1, rounds + 1):
+            connection.execute(
+                insert(GameRound),
+                {
+                    "id": round_id,
+                    "score_timestamp": f"{round_id // 60:02}:{round_id % 60:02}",
+                },
+            )
+            round_scores, round_statuses = [], []
+            for (team, service), total in totals.items():
+                total[0] += rng.randrange(100)
+                total[1] += rng.randrange(50)
+                status = rng.choice(statuses)
+                round_scores.append(
+                    {
+                        "team_id": team,
+                        "service_id": service,
+                        "game_round_id": round_id,
+                        "offense_total": total[0],
+                        "defence_total": total[1],
+                    }
+                )
+                round_statuses.append(
+                    {
+                        "team_id": team,
+                        "service_id": service,
+                        "game_round_id": round_id,
+                        "status": status,
+                    }
+                )
+                service_series[team, service].set(round_id, *total, status)
+            connection.execute(insert(ServiceScore), round_scores)
+            connection.execute(insert(ServiceStatus), round_statuses)
+            for team in team_ids:
+                scores[team] += rng.randrange(1000)
+            ranked = sorted(team_ids, key=lambda team: -scores[team])
+            for rank, team in enumerate(ranked, 1):
+                team_series[team].set(round_id, scores[team], rank)
+            connection.execute(
+                insert(HighscoreAndSLA),
+                {
+                    "game_round_id": round_id,
+                    "label": f"{round_id}",
+                    "score": scores[1],
+                    "position": ranked.index(1) + 1,
+                    "sla": "99%",
+                    "me_team": "team-1",
+                },
+            )
+        connection.execute(
+            insert(ServiceHistory),
+            [
+                {
+                    "team_id": team,
+                    "service_id": service,
+                    "chunk": chunk,
+                    **part.to_blobs(),
+                }
+                for (team, service), series in service_series.items()
+                for chunk, part in series.chunks()
+            ],
+        )
+        connection.execute(
+            insert(TeamHistory),
+            [
+                {"team_id": team, "chunk": chunk, **part.to_blobs()}
+                for team, series in team_series.items()
+                for chunk, part in series.chunks()
+            ],
+        )
+    engine.dispose()
+
+
+def export_with_orm(db_path: str, directory: str) -> int:
+    """The scores and statuses as CSV through the ORM models, for comparison."""
+    engine = _open_archive(db_path)
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    with Session(engine) as session:
+        with gzip.open(os.path.join(directory, "service_scores.csv.gz"), "wt") as file:
+            writer = csv.writer(file)
+            for score in session.scalars(select(ServiceScore)):
+                writer.writerow(
+                    [
+                        score.game_round.score_timestamp,
+                        score.service.name,
+                        score.team_id,
+                        score.offense_total,
+                        score.defence_total,
+                    ]
+                )
+                count += 1
+        with gzip.open(os.path.join(directory, "service_statuses.csv.gz"), "wt") as file:
+            writer = csv.writer(file)
+            for status in session.scalars(select(ServiceStatus)):
+                writer.writerow(
+                    [
+                        status.game_round.score_timestamp,
+                        status.service.name,
+                        status.team_id,
+                        status.status,
+                    ]
+                )
+                count += 1
+    engine.dispose()
+    return count
+
+
+def _measure(run: Callable[[], object]) -> tuple[float, float]:
+    """Seconds of a run, and peak MiB allocated during a second run."""
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak / 1024 / 1024
+
+
+def _directory_size(directory: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(directory))
+
+
+def _row_counts(db_path: str) -> dict[str, int]:
+    engine = _open_archive(db_path)
+    with engine.connect() as connection:
+        counts = {
+            table.name: connection.scalar(select(func.count()).select_from(table))
+            for table in GAME_TABLES
+        }
+    engine.dispose()
+    return counts
+
+
+def _import_fresh(directory: str, db_path: str) -> dict[str, int]:
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    engine = create_db_engine(db_path)
+    prepare_database(engine)
+    counts = import_game(engine, directory)
+    engine.dispose()
+    return counts
+
+
+def benchmark(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        games = []
+        for game in range(args.games):
+            path = os.path.join(tmp, f"game-{game}.sqlite3")
+            build_game(path, args.rounds, args.teams, args.services, seed=game)
+            games.append(path)
+        rows = sum(sum(_row_counts(path).values()) for path in games)
+        database_bytes = sum(os.path.getsize(path) for path in games)
+
+        def run_export(fmt: str) -> Callable[[], None]:
+            def run() -> None:
+                for path in games:
+                    engine = _open_archive(path)
+                    export_game(engine, os.path.join(tmp, fmt, _game_name(path)), fmt)
+                    engine.dispose()
+
+            return run
+
+        def run_orm() -> None:
+            for path in games:
+                export_with_orm(path, os.path.join(tmp, "orm", _game_name(path)))
+
+        def run_import(fmt: str) -> Callable[[], None]:
+            def run() -> None:
+                for path in games:
+                    _import_fresh(
+                        os.path.join(tmp, fmt, _game_name(path)),
+                        os.path.join(tmp, f"import-{fmt}.sqlite3"),
+                    )
+
+            return run
+
+        result = {
+            "games": args.games,
+            "rows": rows,
+            "database_bytes": database_bytes,
+        }
+        seconds, peak = _measure(run_orm)
+        result["orm"] = {
+            "export_s": seconds,
+            "export_peak_mib": peak,
+            "bytes": sum(
+                _directory_size(os.path.join(tmp, "orm", _game_name(path)))
+                for path in games
+            ),
+        }
+        for fmt in FORMATS:
+            seconds, peak = _measure(run_export(fmt))
+            import_seconds, import_peak = _measure(run_import(fmt))
+            # The last game went through a round trip, it should be the same
+            imported = _row_counts(os.path.join(tmp, f"import-{fmt}.sqlite3"))
+            if imported != _row_counts(games[-1]):
+                raise RuntimeError(f"{fmt} import differs: {imported}")
+            result[fmt] = {
+                "export_s": seconds,
+                "export_peak_mib": peak,
+                "import_s": import_seconds,
+                "import_peak_mib": import_peak,
+                "bytes": sum(
+                    _directory_size(os.path.join(tmp, fmt, _game_name(path)))
+                    for path in games
+                ),
+            }
+    return result
+
+
+def print_benchmark(result: dict) -> None:
+    print(
+        f"{result['games']} games, {result['rows']} rows, "
+        f"{result['database_bytes'] / 1024 / 1024:.1f} MiB of SQLite"
+    )
+    print(f"{'':8} {'export s':>9} {'peak MiB':>9} {'MiB':>7} {'import s':>9} {'peak MiB':>9}")
+    for name in ["orm", *FORMATS]:
+        run = result[name]
+        line = (
+            f"{name:8} {run['export_s']:9.2f} {run['export_peak_mib']:9.1f} "
+            f"{run['bytes'] / 1024 / 1024:7.2f}"
+        )
+        if "import_s" in run:
+            line += f" {run['import_s']:9.2f} {run['import_peak_mib']:9.1f}"
+        print(line)
+    print("(orm only writes the service scores and statuses)")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export games")
+    export_parser.add_argument("databases", nargs="+")
+    export_parser.add_argument("--out", default="exports")
+    export_parser.add_argument("--format", choices=list(FORMATS), default="columns")
+
+    import_parser = commands.add_parser("import", help="Import an exported game")
+    import_parser.add_argument("directory")
+    import_parser.add_argument("--db", required=True, help="New database file")
+
+    benchmark_parser = commands.add_parser("benchmark", help="Compare the exports")
+    benchmark_parser.add_argument("--games", type=int, default=3)
+    benchmark_parser.add_argument("--rounds", type=int, default=500)
+    benchmark_parser.add_argument("--teams", type=int, default=30)
+    benchmark_parser.add_argument("--services", type=int, default=10)
+    benchmark_parser.add_argument("--json", help="Write results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.command == "export":
+        for path in args.databases:
+            engine = _open_archive(path)
+            directory = os.path.join(args.out, _game_name(path))
+            counts = export_game(engine, directory, args.format)
+            engine.dispose()
+            print(f"{path} -> {directory}: {sum(counts.values())} rows")
+    elif args.command == "import":
+        engine = create_db_engine(args.db)
+        prepare_database(engine)
+        counts = import_game(engine, args.directory)
+        engine.dispose()
+        print(f"{args.directory} -> {args.db}: {sum(counts.values())} rows")
+    else:
+        result = benchmark(args)
+        print_benchmark(result)
+        if args.json:
+            with open(args.json, "w") as json_file:
+                json.dump({"args": vars(args), "result": result}, json_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""
+Synthetic and recorded scoreboards, served by a local stand-in for the
+Cybernet scoreboard server.
+"""
+
+import datetime
+import gzip
+import json
+import random
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATUSES = ["OK", "OK", "OK", "OK", "FW", "FF", "FR", "FC"]
+
+
+def generate_game(
+    teams: int = 30,
+    services: int = 10,
+    rounds: int = 158,
+    padding_bytes: int = 0,
+    me_team: str = "xren",
+    seed: int = 0,
+) -> list[dict]:
+    """Every round's scoreboard of a synthetic game, as the server returns it.
+
+    Args:
+        teams: Number of teams, the first one is me_team.
+        services: Number of services per team.
+        rounds: Number of rounds.
+        padding_bytes: Extra bytes of filler per team, to inflate the payload.
+        me_team: Name of our team.
+        seed: Seed for the random scores.
+    """
+    rnd = random.Random(seed)
+    start = datetime.datetime(2024, 11, 20, 10, 0)
+    labels = [
+        (start + datetime.timedelta(minutes=2 * r)).strftime("%H:%M")
+        for r in range(rounds)
+    ]
+    names = [me_team] + [f"team-{t}" for t in range(1, teams)]
+    service_names = [f"service-{s}" for s in range(services)]
+    scores = {name: [0] for name in names}
+    totals = {name: {s: [0, 0] for s in service_names} for name in names}
+    padding = "x" * padding_bytes
+
+    game = []
+    for r in range(rounds):
+        highscore = []
+        for name in names:
+            for service in service_names:
+                totals[name][service][0] += rnd.randint(0, 40)
+                totals[name][service][1] += rnd.randint(0, 20)
+            scores[name].append(scores[name][-1] + rnd.randint(0, 100))
+            highscore.append(
+                {
+                    "name": name,
+                    "sla": f"{rnd.randint(80, 100)}%",
+                    "scores": scores[name][1:],
+                    "services": {
+                        service: {
+                            "status": rnd.choice(STATUSES),
+                            "capture": capture,
+                            "lost": lost,
+                        }
+                        for service, (capture, lost) in totals[name].items()
+                    },
+                    "padding": padding,
+                }
+            )
+        game.append(
+            {"success": {"highscore": highscore, "highscore_labels": labels[: r + 1]}}
+        )
+    return game
+
+
+def load_recording(path: str) -> list[dict]:
+    """Scoreboards recorded as JSON lines, one server response per line.
+
+    Such a file can be made with e.g. `curl -s <SCOREBOARD_URL> >> game.jsonl`
+    once per round."""
+    with open(path) as recording:
+        return [json.loads(line) for line in recording if line.strip()]
+
+
+class FakeScoreboardServer:
+    """Serves a list of scoreboards over HTTP from a background thread.
+
+    Like the development server, `<url>/<num_samples>/<index>` returns the
+    index-th scoreboard (1-based). Plain `<url>` returns the current one,
+    which advance() moves forward. ETags, 304s and gzip are supported, and
+    requests, connections and body bytes are counted."""
+
+    def __init__(self, scoreboards: list[dict], port: int = 0) -> None:
+        self._bodies = [json.dumps(scoreboard).encode() for scoreboard in scoreboards]
+        self._gzipped: dict[int, bytes] = {}
+        self.current = 0
+        self.requests = 0
+        self.connections = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/api/data"
+
+    @property
+    def rounds(self) -> int:
+        return len(self._bodies)
+
+    def advance(self) -> None:
+        self.current = min(self.current + 1, len(self._bodies) - 1)
+
+    def _count(self, **counters: int) -> None:
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def _body(self, index: int, compressed: bool) -> bytes:
+        if not compressed:
+            return self._bodies[index]
+        if index not in self._gzipped:
+            self._gzipped[index] = gzip.compress(self._bodies[index], compresslevel=5)
+        return self._gzipped[index]
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                fake._count(connections=1)
+                super().setup()
+                # Headers and body go out in separate writes, don't let
+                # Nagle + delayed ACKs add 40 ms to every response
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def log_message(self, *args) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                fake._count(requests=1)
+                parts = self.path.rstrip("/").split("/")
+                if len(parts) >= 2 and parts[-1].isdigit() and parts[-2].isdigit():
+                    index = min(max(int(parts[-1]), 1), fake.rounds) - 1
+                else:
+                    index = fake.current
+                etag = f'"round-{index}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                compressed = "gzip" in self.headers.get("Accept-Encoding", "")
+                body = fake._body(index, compressed)
+                fake._count(bytes_sent=len(body))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("ETag", etag)
+                if compressed:
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self) -> "FakeScoreboardServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,158 @@
+"""
+Collector fan-out benchmark.
+
+Runs one collector (the app, headless, broadcasting) against a local fake
+scoreboard server and connects --viewers viewers to it from a second
+process, the way viewer dashboards subscribe. Replays the game round by
+round and reports the scoreboard requests per round and how long every
+snapshot took from the collector to each viewer.
+
+From the root directory of the project:
+
+``uv run python -m tools.fanout --viewers 40 --rounds 30``
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from services.broadcast import receive_snapshots
+
+
+async def run_viewers(port: int, count: int, last_round: int) -> list[list[float]]:
+    """Runs in the viewer process: every viewer's latencies in ms, until it
+    saw the last round."""
+
+    async def view() -> list[float]:
+        latencies = []
+        async for sent, snapshot in receive_snapshots("127.0.0.1", port):
+            latencies.append((time.time() - sent) * 1000)
+            if snapshot["round"] >= last_round:
+                return latencies
+
+    return await asyncio.gather(*(view() for _ in range(count)))
+
+
+async def run_collector(args: argparse.Namespace) -> dict:
+    from tools.app import APP_PATH, load_app_class
+    from tools.fake_scoreboard import FakeScoreboardServer, generate_game
+
+    app_class = load_app_class()
+
+    class CollectorApp(app_class):
+        CSS_PATH = APP_PATH.parent / app_class.CSS_PATH
+
+        async def _poll_scores(self) -> None:
+            # The benchmark drives every update itself
+            pass
+
+    scoreboards = generate_game(args.teams, args.services, args.rounds)
+    server = FakeScoreboardServer(scoreboards).start()
+    with tempfile.TemporaryDirectory() as tmp:
+        app = CollectorApp(
+            url=server.url,
+            refresh_interval=3600,
+            db_path=os.path.join(tmp, "collector.sqlite3"),
+            broadcast=("127.0.0.1", 0),
+        )
+        try:
+            async with app.run_test(size=(160, 50)) as pilot:
+                await pilot.pause()
+                viewers = await asyncio.create_subprocess_exec(
+                    sys.executable,
+                    "-m",
+                    "tools.fanout",
+                    "--child",
+                    str(app._broadcaster.port),
+                    "--viewers",
+                    str(args.viewers),
+                    "--rounds",
+                    str(args.rounds),
+                    stdout=subprocess.PIPE,
+                )
+                try:
+                    while app._broadcaster.viewers < args.viewers:
+                        await asyncio.sleep(0.05)
+
+                    publish_times = []
+                    publish = app._broadcaster.publish
+
+                    def timed_publish(snapshot: dict) -> None:
+                        start = time.perf_counter()
+                        publish(snapshot)
+                        publish_times.append((time.perf_counter() - start) * 1000)
+
+                    app._broadcaster.publish = timed_publish
+                    for _ in range(args.rounds):
+                        await app._update_scores()
+                        await asyncio.sleep(args.interval)
+                        server.advance()
+                    stdout, _ = await asyncio.wait_for(viewers.communicate(), 60)
+                finally:
+                    if viewers.returncode is None:
+                        viewers.kill()
+                        await viewers.wait()
+        finally:
+            server.stop()
+
+    latencies = [latency for viewer in json.loads(stdout) for latency in viewer]
+    return {
+        "rounds": args.rounds,
+        "viewers": args.viewers,
+        "requests": server.requests,
+        "requests_per_round": server.requests / args.rounds,
+        "snapshots_received": len(latencies),
+        "publish_ms": statistics.fmean(publish_times),
+        "latency_mean_ms": statistics.fmean(latencies),
+        "latency_p95_ms": statistics.quantiles(latencies, n=20, method="inclusive")[-1],
+        "latency_max_ms": max(latencies),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--viewers", type=int, default=40)
+    parser.add_argument("--teams", type=int, default=30)
+    parser.add_argument("--services", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=30)
+    parser.add_argument(
+        "--interval", type=float, default=0.2, help="Seconds between rounds"
+    )
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.child is not None:
+        latencies = asyncio.run(run_viewers(args.child, args.viewers, args.rounds))
+        print(json.dumps(latencies))
+        return 0
+
+    result = asyncio.run(run_collector(args))
+    print(
+        f"{result['rounds']} rounds, {result['viewers']} viewers: "
+        f"{result['requests']} scoreboard requests "
+        f"({result['requests_per_round']:.2f} per round), "
+        f"{result['snapshots_received']} snapshots received"
+    )
+    print(
+        f"publish {result['publish_ms']:.2f} ms, collector to viewer "
+        f"mean {result['latency_mean_ms']:.2f} ms, "
+        f"p95 {result['latency_p95_ms']:.2f} ms, max {result['latency_max_ms']:.2f} ms"
+    )
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"args": vars(args), "result": result}, json_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
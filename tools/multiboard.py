@@ -0,0 +1,159 @@
+"""
+Several scoreboards benchmark.
+
+Serves --scoreboards games from local fake scoreboard servers and watches
+them for --rounds rounds, headless, from one app with a tab per scoreboard
+and from as many separate apps, each in its own process. Reports the CPU
+time and peak memory of the apps together.
+
+From the root directory of the project:
+
+``uv run python -m tools.multiboard --scoreboards 4 --rounds 50``
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from tools.fake_scoreboard import FakeScoreboardServer, generate_game
+
+
+async def watch(urls: list[str], rounds: int, directory: str) -> None:
+    """Runs in an app process: every round of every url."""
+    from tools.app import APP_PATH, load_app_class
+
+    app_class = load_app_class()
+
+    class HeadlessApp(app_class):
+        CSS_PATH = APP_PATH.parent / app_class.CSS_PATH
+
+        def on_mount(self, event) -> None:
+            # No timers: every update is driven from here
+            event.prevent_default()
+
+    scoreboards = [
+        {
+            "name": f"game-{index}",
+            "url": url,
+            "team": "xren",
+            "db_path": os.path.join(directory, f"{os.getpid()}-{index}.sqlite3"),
+            "dev_server": True,
+            "num_samples": rounds,
+        }
+        for index, url in enumerate(urls)
+    ]
+    app = HeadlessApp(url=urls[0], refresh_interval=3600, scoreboards=scoreboards)
+    async with app.run_test(size=(160, 50)) as pilot:
+        for _ in range(rounds):
+            await app._update_scores()
+            await pilot.pause()
+
+
+def run_child(urls: list[str], rounds: int, directory: str) -> None:
+    started = time.perf_counter()
+    asyncio.run(watch(urls, rounds, directory))
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    print(
+        json.dumps(
+            {
+                "wall_s": time.perf_counter() - started,
+                "cpu_s": usage.ru_utime + usage.ru_stime,
+                # KiB on Linux
+                "max_rss_mib": usage.ru_maxrss / 1024,
+            }
+        )
+    )
+
+
+def run_apps(groups: list[list[str]], rounds: int, directory: str) -> dict:
+    """Every group of urls in its own app process, all at the same time."""
+    started = time.perf_counter()
+    children = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "tools.multiboard",
+                "--child",
+                ",".join(urls),
+                "--rounds",
+                str(rounds),
+                "--directory",
+                directory,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        for urls in groups
+    ]
+    results = []
+    for child in children:
+        stdout, _ = child.communicate(timeout=600)
+        if child.returncode != 0:
+            raise RuntimeError(f"App process failed with {child.returncode}")
+        results.append(json.loads(stdout.strip().splitlines()[-1]))
+    return {
+        "processes": len(children),
+        "wall_s": time.perf_counter() - started,
+        "cpu_s": sum(result["cpu_s"] for result in results),
+        "max_rss_mib": sum(result["max_rss_mib"] for result in results),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scoreboards", type=int, default=4)
+    parser.add_argument("--teams", type=int, default=30)
+    parser.add_argument("--services", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.child is not None:
+        run_child(args.child.split(","), args.rounds, args.directory)
+        return 0
+
+    servers = [
+        FakeScoreboardServer(generate_game(args.teams, args.services, args.rounds)).start()
+        for _ in range(args.scoreboards)
+    ]
+    urls = [server.url for server in servers]
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            result = {
+                "one_process": run_apps([urls], args.rounds, directory),
+                "separate_processes": run_apps(
+                    [[url] for url in urls], args.rounds, directory
+                ),
+            }
+    finally:
+        for server in servers:
+            server.stop()
+
+    print(f"{args.scoreboards} scoreboards, {args.rounds} rounds each")
+    print(f"{'':20} {'CPU s':>7} {'wall s':>7} {'peak RSS MiB':>13}")
+    for name, run in result.items():
+        print(
+            f"{name.replace('_', ' '):20} {run['cpu_s']:7.2f} {run['wall_s']:7.2f} "
+            f"{run['max_rss_mib']:13.1f}"
+        )
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"args": vars(args), "result": result}, json_file)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
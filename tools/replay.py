@@ -0,0 +1,383 @@
+"""
+Headless replay benchmark.
+
+Serves a synthetic (or recorded) game from a local fake scoreboard server
+and replays it round by round, first through ScoreStoreService and
+StatsRetriever, then through the Textual app via App.run_test(). Reports
+per round fetch, ingest, query and render time plus memory, and compares
+against an earlier run to catch regressions.
+
+Also polls the game on a simulated clock, with rounds published a random
+bit after their label, to compare the detection latency and requests per
+round of the fixed refresh interval with following the round clock.
+
+From the root directory of the project:
+
+``uv run python -m tools.replay --teams 30 --services 10 --rounds 158``
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from bisect import bisect_right
+
+from models.database import create_db_engine
+from models.migrations import prepare_database
+from config.settings import REFRESH_INTERVAL_S
+from services.dashboard_model import DashboardModel
+from services.db_worker import DatabaseWorker
+from services.refresh_scheduler import (
+    FAILED,
+    NEW_ROUND,
+    NO_NEW_ROUND,
+    RefreshScheduler,
+    label_seconds,
+)
+from services.score_store import ScoreStoreService
+from services.stats_retriever import StatsRetriever
+from tools.app import APP_PATH, load_app_class
+from tools.fake_scoreboard import FakeScoreboardServer, generate_game, load_recording
+
+METRICS = ["fetch_ms", "ingest_ms", "query_ms", "memory_mb", "update_ms", "render_ms"]
+
+
+def _memory_mb() -> float:
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0] / 1024 / 1024
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.0
+    # Peak resident set size, in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def replay_store(
+    server: FakeScoreboardServer,
+    db_path: str,
+    tracked_teams: list[str] | str | None = None,
+) -> list[dict]:
+    engine = create_db_engine(db_path)
+    prepare_database(engine, reset=True)
+    db_worker = DatabaseWorker()
+    score_store = ScoreStoreService(
+        engine, db_worker, tracked_teams=[] if tracked_teams is None else tracked_teams
+    )
+    stats_retriever = StatsRetriever(engine)
+    dashboard = DashboardModel()
+
+    ingest_times = []
+    ingest_scoreboard = score_store.ingest_scoreboard
+
+    def timed_ingest(scoreboard: dict) -> bool:
+        start = time.perf_counter()
+        try:
+            return ingest_scoreboard(scoreboard)
+        finally:
+            ingest_times.append(time.perf_counter() - start)
+
+    score_store.ingest_scoreboard = timed_ingest
+
+    results = []
+    for round_number in range(1, server.rounds + 1):
+        ingest_times.clear()
+        start = time.perf_counter()
+        updated = await score_store.get_scores(server.url)
+        fetched = time.perf_counter()
+        if updated:
+            dashboard.apply_round(*score_store.latest_round)
+        await db_worker.run(
+            stats_retriever.get_dashboard_snapshot, include_services=False
+        )
+        dashboard.get_service_updates_dict()
+        queried = time.perf_counter()
+        results.append(
+            {
+                "round": round_number,
+                "fetch_ms": (fetched - start - sum(ingest_times)) * 1000,
+                "ingest_ms": sum(ingest_times) * 1000,
+                "query_ms": (queried - fetched) * 1000,
+                "memory_mb": _memory_mb(),
+            }
+        )
+        server.advance()
+
+    await score_store.aclose()
+    db_worker.shutdown()
+    engine.dispose()
+    return results
+
+
+async def replay_app(
+    server: FakeScoreboardServer, db_path: str, size: tuple[int, int]
+) -> list[dict]:
+    app_class = load_app_class()
+
+    class HeadlessApp(app_class):
+        # Relative CSS paths resolve against the module of the subclass
+        CSS_PATH = APP_PATH.parent / app_class.CSS_PATH
+
+        def on_mount(self, event) -> None:
+            # No timers: the replay drives every update itself
+            event.prevent_default()
+
+    app = HeadlessApp(
+        url=server.url,
+        refresh_interval=3600,
+        counter=True,
+        num_samples=server.rounds,
+        db_path=db_path,
+    )
+    results = []
+    async with app.run_test(size=size) as pilot:
+        await pilot.pause()
+        for round_number in range(1, server.rounds + 1):
+            start = time.perf_counter()
+            await app._update_scores()
+            updated = time.perf_counter()
+            await pilot.pause()
+            results.append(
+                {
+                    "round": round_number,
+                    "update_ms": (updated - start) * 1000,
+                    "render_ms": (time.perf_counter() - updated) * 1000,
+                }
+            )
+    return results
+
+
+def simulate_polling(
+    labels: list[str],
+    scheduler: RefreshScheduler,
+    jitter_s: float,
+    error_rate: float,
+    seed: int = 0,
+) -> dict | None:
+    """Poll the game on a simulated clock, the way the app's timer does.
+
+    Returns:
+        Mean and p95 seconds until a new round was seen, requests per round
+        and rounds never seen, or None when the labels aren't times.
+    """
+    seconds = [label_seconds(label) for label in labels]
+    if len(seconds) < 2 or None in seconds:
+        return None
+    rng = random.Random(seed)
+    clock = [0]
+    for previous, current in zip(seconds, seconds[1:]):
+        clock.append(clock[-1] + (current - previous) % (24 * 60 * 60))
+    published = [time + rng.uniform(0, jitter_s) for time in clock]
+
+    # Start with the first round up, like a dashboard started mid-game
+    now = published[0]
+    seen = -1
+    latencies = []
+    requests = 0
+    missed = 0
+    while now < published[-1] + (clock[-1] - clock[-2]):
+        requests += 1
+        current = bisect_right(published, now) - 1
+        if rng.random() < error_rate:
+            outcome = FAILED
+        elif current > seen:
+            if seen >= 0:
+                latencies.append(now - published[current])
+                missed += current - seen - 1
+            seen = current
+            scheduler.add_labels([labels[current]])
+            outcome = NEW_ROUND
+        else:
+            outcome = NO_NEW_ROUND
+        scheduler.record(now, outcome)
+        now += scheduler.next_delay(now)
+    return {
+        "latency_s": statistics.fmean(latencies),
+        "latency_p95_s": statistics.quantiles(latencies, n=20, method="inclusive")[-1],
+        "requests_per_round": requests / len(published),
+        "missed_rounds": missed,
+    }
+
+
+def print_polling_report(polling: dict) -> None:
+    print(
+        f"{'polling':>10} {'latency s':>10} {'p95 s':>10} "
+        f"{'req/round':>10} {'missed':>10}"
+    )
+    for name, result in polling.items():
+        print(
+            f"{name:>10} {result['latency_s']:>10.2f} {result['latency_p95_s']:>10.2f} "
+            f"{result['requests_per_round']:>10.2f} {result['missed_rounds']:>10}"
+        )
+
+
+def summarize(results: list[dict]) -> dict:
+    summary = {}
+    for metric in METRICS:
+        values = [result[metric] for result in results if metric in result]
+        if values:
+            summary[metric] = {
+                "mean": statistics.fmean(values),
+                "p95": (
+                    statistics.quantiles(values, n=20, method="inclusive")[-1]
+                    if len(values) > 1
+                    else values[0]
+                ),
+                "max": max(values),
+                "last": values[-1],
+            }
+    return summary
+
+
+def print_report(results: list[dict], summary: dict, every: int) -> None:
+    columns = ["round"] + METRICS
+    print(" ".join(f"{column:>10}" for column in columns))
+    for result in results:
+        if result["round"] % every == 0 or result["round"] == len(results):
+            print(
+                " ".join(
+                    f"{result.get(column, float('nan')):>10.2f}"
+                    if column != "round"
+                    else f"{result[column]:>10}"
+                    for column in columns
+                )
+            )
+    print()
+    print(f"{'':>10} {'mean':>10} {'p95':>10} {'max':>10} {'last':>10}")
+    for metric, stats in summary.items():
+        print(
+            f"{metric:>10} "
+            + " ".join(f"{stats[key]:>10.2f}" for key in ("mean", "p95", "max", "last"))
+        )
+
+
+def compare(summary: dict, baseline_path: str, tolerance: float) -> list[str]:
+    """Metrics whose mean got worse than the baseline by more than tolerance."""
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["summary"]
+    regressions = []
+    for metric, stats in summary.items():
+        if metric in baseline and baseline[metric]["mean"] > 0:
+            ratio = stats["mean"] / baseline[metric]["mean"]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{metric}: {baseline[metric]['mean']:.2f} -> {stats['mean']:.2f} ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--teams", type=int, default=30)
+    parser.add_argument("--services", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=158)
+    parser.add_argument(
+        "--padding", type=int, default=0, help="Extra payload bytes per team"
+    )
+    parser.add_argument("--recording", help="Replay a JSON lines recording instead")
+    parser.add_argument(
+        "--track-all", action="store_true", help="Store the services of every team"
+    )
+    parser.add_argument("--no-app", action="store_true", help="Skip the Textual app")
+    parser.add_argument("--size", default="160x50", help="Terminal size of the app")
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="Report traced Python heap instead of peak RSS (slower)",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=3.0,
+        help="Simulated seconds a round may be published after its label",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of simulated polls that fail",
+    )
+    parser.add_argument("--every", type=int, default=10, help="Print every Nth round")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare with results written by --json")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown vs baseline"
+    )
+    return parser.parse_args(argv)
+
+
+async def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.recording:
+        scoreboards = load_recording(args.recording)
+    else:
+        scoreboards = generate_game(
+            args.teams, args.services, args.rounds, padding_bytes=args.padding
+        )
+    if args.trace_memory:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server = FakeScoreboardServer(scoreboards).start()
+        try:
+            results = await replay_store(
+                server,
+                os.path.join(tmp, "store.sqlite3"),
+                tracked_teams="*" if args.track_all else [],
+            )
+            if not args.no_app:
+                width, height = (int(value) for value in args.size.split("x"))
+                app_results = await replay_app(
+                    server, os.path.join(tmp, "app.sqlite3"), (width, height)
+                )
+                for result, app_result in zip(results, app_results):
+                    result.update(app_result)
+        finally:
+            server.stop()
+
+    summary = summarize(results)
+    print(
+        f"{len(scoreboards)} rounds, {server.requests} requests, "
+        f"{server.connections} connections, {server.bytes_sent / 1024:.0f} KiB sent"
+    )
+    print_report(results, summary, args.every)
+
+    labels = scoreboards[-1]["success"]["highscore_labels"]
+    polling = {
+        name: simulate_polling(labels, scheduler, args.jitter, args.error_rate)
+        for name, scheduler in (
+            (f"every {REFRESH_INTERVAL_S}s", RefreshScheduler(adaptive=False)),
+            ("clock", RefreshScheduler(adaptive=True)),
+        )
+    }
+    if None not in polling.values():
+        print()
+        print_polling_report(polling)
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(
+                {
+                    "args": vars(args),
+                    "summary": summary,
+                    "polling": polling,
+                    "rounds": results,
+                },
+                json_file,
+            )
+    if args.baseline:
+        regressions = compare(summary, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
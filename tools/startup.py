@@ -0,0 +1,212 @@
+"""
+Cold start benchmark.
+
+Starts the app in a fresh interpreter, headless, against a local fake
+scoreboard server, and measures from process start until:
+
+- imported: the app's module is imported
+- first_frame: the first frame is painted
+- stored: what's in the database is shown
+- live: the first fetched round is shown
+
+Runs once on a new database and then restarts on the now existing one,
+which paints the cached snapshot in its first frame. Also lists the
+slowest imports before the first frame (python -X importtime), and fails
+when first_frame of the restart is slower than --target-ms.
+
+From the root directory of the project:
+
+``uv run python -m tools.startup --rounds 100``
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import TYPE_CHECKING
+
+from tools.app import APP_PATH, load_app_class
+
+if TYPE_CHECKING:
+    from tools.fake_scoreboard import FakeScoreboardServer
+
+MILESTONES = ["imported", "first_frame", "stored", "live"]
+FIRST_FRAME_MARKER = "--- first frame ---"
+_IMPORT_TIME = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def run_child(started: float, url: str, db_path: str, size: tuple[int, int]) -> None:
+    """Runs in the benchmarked interpreter; prints the milestones as JSON."""
+    marks = {}
+
+    def mark(name: str) -> None:
+        marks.setdefault(name, (time.time() - started) * 1000)
+
+    app_class = load_app_class()
+    mark("imported")
+
+    class StartupApp(app_class):
+        CSS_PATH = APP_PATH.parent / app_class.CSS_PATH
+
+        def on_mount(self) -> None:
+            self.call_after_refresh(self._first_frame)
+
+        def _first_frame(self) -> None:
+            mark("first_frame")
+            print(FIRST_FRAME_MARKER, file=sys.stderr, flush=True)
+
+        async def _show_stored_scores(self, scoreboard) -> None:
+            await super()._show_stored_scores(scoreboard)
+            mark("stored")
+
+        async def _update_scores(self, *args) -> None:
+            await super()._update_scores(*args)
+            mark("live")
+            self.exit()
+
+    # The first update runs right after the first frame, no need for the timer
+    app = StartupApp(url=url, refresh_interval=3600, db_path=db_path)
+    app.run(headless=True, size=size)
+    print(json.dumps(marks))
+
+
+def slowest_imports(stderr: str, count: int) -> tuple[float, list[tuple[str, float]]]:
+    """Total import time before the first frame and the slowest top-level
+    imports, from -X importtime output."""
+    total = 0
+    top_level = []
+    for line in stderr.split(FIRST_FRAME_MARKER)[0].splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        total += int(self_us)
+        if len(indent) == 1:
+            top_level.append((name, int(cumulative_us) / 1000))
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return total / 1000, top_level[:count]
+
+
+def measure(
+    server: "FakeScoreboardServer", db_path: str, size: str, import_time: bool = False
+) -> tuple[dict, str]:
+    """One start of the app, which finds a new round on the server."""
+    server.advance()
+    command = [sys.executable]
+    if import_time:
+        command += ["-X", "importtime"]
+    started = time.time()
+    command += [
+        "-m",
+        "tools.startup",
+        "--child",
+        str(started),
+        "--url",
+        server.url,
+        "--db",
+        db_path,
+        "--size",
+        size,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def prefill(db_path: str, scoreboards: list[dict]) -> None:
+    """Store the rounds, as a dashboard that ran before would have."""
+    from models.database import create_db_engine
+    from models.migrations import prepare_database
+    from services.db_worker import DatabaseWorker
+    from services.score_store import ScoreStoreService
+
+    engine = create_db_engine(db_path)
+    prepare_database(engine)
+    db_worker = DatabaseWorker()
+    score_store = ScoreStoreService(engine, db_worker)
+    for scoreboard in scoreboards:
+        score_store.ingest_scoreboard(scoreboard["success"])
+    db_worker.shutdown()
+    engine.dispose()
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--teams", type=int, default=30)
+    parser.add_argument("--services", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=100, help="Rounds stored before")
+    parser.add_argument("--repeat", type=int, default=5, help="Restarts to measure")
+    parser.add_argument("--size", default="160x50", help="Terminal size of the app")
+    parser.add_argument(
+        "--target-ms", type=float, default=800, help="Target first_frame on restart"
+    )
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.child is not None:
+        width, height = (int(value) for value in args.size.split("x"))
+        run_child(args.child, args.url, args.db, (width, height))
+        return 0
+
+    # Not needed by the child, which should only import what the app does
+    from tools.fake_scoreboard import FakeScoreboardServer, generate_game
+
+    # A new round for every start
+    scoreboards = generate_game(
+        args.teams, args.services, args.rounds + args.repeat + 2
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.sqlite3")
+        server = FakeScoreboardServer(scoreboards).start()
+        server.current = args.rounds - 1
+        try:
+            prefill(db_path, scoreboards[: args.rounds])
+            # The first start after an upgrade has no cached snapshot yet
+            runs = {"first start": [measure(server, db_path, args.size)[0]]}
+            runs["restart"] = [
+                measure(server, db_path, args.size)[0] for _ in range(args.repeat)
+            ]
+            _, stderr = measure(server, db_path, args.size, import_time=True)
+        finally:
+            server.stop()
+
+    summary = {
+        name: {
+            milestone: statistics.median(result[milestone] for result in results)
+            for milestone in MILESTONES
+        }
+        for name, results in runs.items()
+    }
+    print(f"{'ms since process start':>22} " + " ".join(f"{m:>12}" for m in MILESTONES))
+    for name, milestones in summary.items():
+        print(f"{name:>22} " + " ".join(f"{milestones[m]:>12.0f}" for m in MILESTONES))
+
+    total, imports = slowest_imports(stderr, 8)
+    print(f"\nImports before the first frame: {total:.0f} ms, slowest:")
+    for name, cumulative in imports:
+        print(f"{cumulative:>10.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump({"args": vars(args), "summary": summary}, json_file)
+    first_frame = summary["restart"]["first_frame"]
+    if first_frame > args.target_ms:
+        print(f"\nFirst frame after {first_frame:.0f} ms, target {args.target_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+from textual.app import ComposeResult
+from textual.containers import VerticalScroll
+from textual.reactive import reactive
+
+from services.metrics import metrics
+from widgets.leaderboard_panel import LeaderboardPanel
+from widgets.service_row import ServiceRow
+from widgets.top_row import TopRow
+
+
+class Dashboard(VerticalScroll):
+    """Everything shown of one scoreboard: our score, a row per service and
+    the leaderboard."""
+
+    DEFAULT_CSS = """
+    Dashboard {
+        height: 1fr;
+    }
+    """
+
+    current_score = reactive({})
+    service_updates = reactive({})
+
+    def __init__(self, name: str | None = None, **kwargs) -> None:
+        """
+        Args:
+            name: Name of the scoreboard, shown in the title when there are
+                several.
+        """
+        super().__init__(**kwargs)
+        self._scoreboard_name = name
+        self._service_rows: dict[str, ServiceRow] = {}
+        self.title = "Cybernet Scoring System"
+
+    @property
+    def sparkline_width(self) -> int:
+        """Rows all have the same width, 0 before the first one is laid out."""
+        return next((row.sparkline_width for row in self._service_rows.values()), 0)
+
+    def compose(self) -> ComposeResult:
+        yield TopRow().data_bind(current_score=Dashboard.current_score)
+        yield LeaderboardPanel()
+
+    def show_snapshot(self, snapshot: dict) -> None:
+        prefix = "Cybernet Scoring System"
+        if self._scoreboard_name is not None:
+            prefix += f" | {self._scoreboard_name}"
+        self.title = f"{prefix} | {snapshot['team']} | Round #{snapshot['round']} | SLA: {snapshot['sla']}"
+        self.current_score = {
+            "score": snapshot["score"],
+            "position": snapshot["position"],
+        }
+        self.service_updates = snapshot["services"]
+        # Snapshots cached before the leaderboard existed don't have it
+        self.query_one(LeaderboardPanel).show_leaderboard(
+            snapshot.get("leaderboard", []), snapshot["team"]
+        )
+
+    async def watch_service_updates(self, service_updates: dict) -> None:
+        """Mount rows for new services only, and hand every row its own data."""
+        with metrics.timer("render.service_updates_ms"):
+            await self._update_service_rows(service_updates)
+
+    async def _update_service_rows(self, service_updates: dict) -> None:
+        for service_name in [
+            name for name in self._service_rows if name not in service_updates
+        ]:
+            await self._service_rows.pop(service_name).remove()
+        new_rows = {
+            service_name: ServiceRow(service_name)
+            for service_name in service_updates
+            if service_name not in self._service_rows
+        }
+        if new_rows:
+            self._service_rows.update(new_rows)
+            await self.mount_all(new_rows.values())
+        for service_name, row in self._service_rows.items():
+            row.service_data = service_updates[service_name]
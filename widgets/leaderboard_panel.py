@@ -0,0 +1,74 @@
+from rich.table import Table
+from rich.text import Text
+from textual.widgets import Static
+
+from config.settings import LEADERBOARD_RANK_DELTA_ROUNDS
+
+
+def _format_delta(delta: int | None) -> Text:
+    if not delta:
+        return Text("-" if delta is None else "=")
+    if delta > 0:
+        return Text(f"▲{delta}", style="chartreuse1")
+    return Text(f"▼{-delta}", style="red")
+
+
+def _format_gap(gap: int | None) -> str:
+    return "" if gap is None else str(gap)
+
+
+class LeaderboardPanel(Static):
+    """Standings of every team, with how many places they moved and how far
+    they are from the teams around them."""
+
+    DEFAULT_CSS = """
+    LeaderboardPanel {
+        display: none;
+        dock: left;
+        width: 64;
+        height: 100%;
+        overflow-y: auto;
+        background: #301030 90%;
+        border-right: white;
+    }
+    LeaderboardPanel.shown {
+        display: block;
+    }
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._rows: list[dict] = []
+        self._me_team = ""
+
+    def toggle(self) -> None:
+        self.toggle_class("shown")
+        if self.has_class("shown"):
+            self._render_rows()
+
+    def show_leaderboard(self, rows: list[dict], me_team: str) -> None:
+        self._rows = rows
+        self._me_team = me_team
+        # Only worth building the table when it's seen
+        if self.has_class("shown"):
+            self._render_rows()
+
+    def _render_rows(self) -> None:
+        table = Table(box=None, expand=True, pad_edge=False)
+        table.add_column("#", justify="right")
+        table.add_column("team")
+        table.add_column("score", justify="right")
+        table.add_column(f"Δ{LEADERBOARD_RANK_DELTA_ROUNDS}", justify="right")
+        table.add_column("to ↑", justify="right")
+        table.add_column("to ↓", justify="right")
+        for row in self._rows:
+            table.add_row(
+                str(row["rank"]),
+                row["team"],
+                str(row["score"]),
+                _format_delta(row["rank_delta"]),
+                _format_gap(row["gap_above"]),
+                _format_gap(row["gap_below"]),
+                style="bold reverse" if row["team"] == self._me_team else None,
+            )
+        self.update(table)
@@ -0,0 +1,55 @@
+from rich.table import Table
+from textual.widgets import Static
+
+from services.metrics import metrics
+
+_COLUMNS = ("last", "mean", "p50", "p95", "max")
+
+
+class MetricsPanel(Static):
+    """Recent timings and counters of the hot paths, refreshed every second
+    while shown."""
+
+    DEFAULT_CSS = """
+    MetricsPanel {
+        display: none;
+        dock: right;
+        width: 72;
+        height: 100%;
+        background: #301030 90%;
+        border-left: white;
+    }
+    MetricsPanel.shown {
+        display: block;
+    }
+    """
+
+    def on_mount(self) -> None:
+        self._timer = self.set_interval(1, self._refresh_metrics, pause=True)
+
+    def toggle(self) -> None:
+        self.toggle_class("shown")
+        if self.has_class("shown"):
+            self._refresh_metrics()
+            self._timer.resume()
+        else:
+            self._timer.pause()
+
+    def _refresh_metrics(self) -> None:
+        snapshot = metrics.snapshot()
+        table = Table(box=None, expand=True, pad_edge=False)
+        table.add_column("metric")
+        for column in _COLUMNS:
+            table.add_column(column, justify="right")
+        for name, summary in snapshot["histograms"].items():
+            table.add_row(
+                name,
+                *(
+                    f"{summary[column]:.1f}" if column in summary else "-"
+                    for column in _COLUMNS
+                ),
+            )
+        table.add_section()
+        for name, value in snapshot["counters"].items():
+            table.add_row(name, str(value))
+        self.update(table)
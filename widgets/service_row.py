@@ -5,15 +5,30 @@ from textual.containers import HorizontalGroup
 from textual.reactive import reactive
 from textual.widgets import Label, Sparkline, Digits
 
-from config import settings
+from services.metrics import metrics
+from services.trends import classify_trends
 
 
 class ServiceRow(HorizontalGroup):
-    service_updates = reactive({}, always_update=True, init=False)
+    service_data = reactive({}, init=False)
 
     def __init__(self, service_name: str) -> None:
         self.service_name = service_name
         super().__init__()
+        # Made up front, rows get data and are asked for their width while
+        # they are still being mounted
+        self._label = Label(
+            self.service_name, classes="servicelabel", id="service_label"
+        )
+        self._off_sparkline = Sparkline(id="off_s")
+        self._off_digits = Digits(id="off_d")
+        self._def_digits = Digits(id="def_d")
+        self._def_sparkline = Sparkline(id="def_s")
+
+    @property
+    def sparkline_width(self) -> int:
+        """Columns of either sparkline, 0 before the first layout."""
+        return self._off_sparkline.content_size.width
 
     @staticmethod
     def _get_class_name_from_service_status(service_status: str) -> str:
@@ -33,73 +48,49 @@ class ServiceRow(HorizontalGroup):
 
     @staticmethod
     def _get_class_name_from_series(score_series: List[int], offense: bool) -> str:
-        selection = score_series[-settings.TREND_LENGTH_ROUNDS :]
-        # Can't measure trend over 1 item. Can't divide by zero.
-        if len(selection) == 0 or len(selection) == 1 or selection[0] == 0:
-            return "cNONE"
-
-        # We want to know how the last score differs from the average of the previous scores in the series
-        average_of_previous = sum(selection[0:-1]) / len(selection[0:-1])
-        last_score = selection[-1]
-        difference_percent = abs((average_of_previous - last_score) / average_of_previous) * 100
-
-        if offense:
-            if difference_percent >= settings.OFFENSIVE_SCORE_THRESHOLDS["high"]:
-                return "cOK"
-            elif difference_percent >= settings.OFFENSIVE_SCORE_THRESHOLDS["medium"]:
-                return "cWARNING"
-            elif difference_percent >= settings.OFFENSIVE_SCORE_THRESHOLDS["low"]:
-                return "cERROR"
-            else:
-                return "cNONE"
-        else:
-            if difference_percent >= settings.DEFENSIVE_SCORE_THRESHOLDS["high"]:
-                return "cERROR"
-            elif difference_percent >= settings.DEFENSIVE_SCORE_THRESHOLDS["medium"]:
-                return "cWARNING"
-            elif difference_percent >= settings.DEFENSIVE_SCORE_THRESHOLDS["low"]:
-                return "cOK"
-            else:
-                return "cNONE"
+        return classify_trends([score_series], offense)[0]
 
     def compose(self) -> ComposeResult:
-        yield Label(self.service_name, classes="servicelabel", id="service_label")
+        yield self._label
         # Offense
-        yield Sparkline(
-            data=self.service_updates.get(self.service_name, {}).get("off_diff"),
-            id="off_s",
-        )
-        yield Digits(id="off_d")
+        yield self._off_sparkline
+        yield self._off_digits
         # Defence
-        yield Digits(id="def_d")
-        yield Sparkline(
-            data=self.service_updates.get(self.service_name, {}).get("def_diff"),
-            id="def_s",
-        )
+        yield self._def_digits
+        yield self._def_sparkline
 
-    def watch_service_updates(self, service_updates: dict) -> None:
-        self.query_one(
-            "#service_label", Label
-        ).classes = self._get_class_name_from_service_status(
-            service_updates.get(self.service_name, {}).get("status")
-        )
+    def watch_service_data(self, old_data: dict, service_data: dict) -> None:
+        with metrics.timer("render.service_row_ms"):
+            self._update_widgets(old_data, service_data)
 
-        self.query_one("#off_d", Digits).update(
-            str(service_updates.get(self.service_name, {}).get("off_total"))
-        )
-        self.query_one("#def_d", Digits).update(
-            str(service_updates.get(self.service_name, {}).get("def_total"))
-        )
-        self.query_one("#off_d", Digits).classes = self._get_class_name_from_series(
-            service_updates.get(self.service_name, {}).get("off_diff"), offense=True
-        )
-        self.query_one("#def_d", Digits).classes = self._get_class_name_from_series(
-            service_updates.get(self.service_name, {}).get("def_diff"), offense=False
-        )
+    def _update_widgets(self, old_data: dict, service_data: dict) -> None:
+        # Only touch the widgets whose data actually changed
+        if service_data.get("status") != old_data.get("status"):
+            self._label.classes = self._get_class_name_from_service_status(
+                service_data.get("status")
+            )
+
+        if service_data.get("off_total") != old_data.get("off_total"):
+            self._off_digits.update(str(service_data.get("off_total")))
+        if service_data.get("def_total") != old_data.get("def_total"):
+            self._def_digits.update(str(service_data.get("def_total")))
+
+        # Trend classes are normally computed for all rows at once, see
+        # services/trends.py
+        if service_data.get("off_diff") != old_data.get("off_diff"):
+            self._off_digits.classes = service_data.get(
+                "off_class"
+            ) or self._get_class_name_from_series(
+                service_data.get("off_diff"), offense=True
+            )
+        if service_data.get("def_diff") != old_data.get("def_diff"):
+            self._def_digits.classes = service_data.get(
+                "def_class"
+            ) or self._get_class_name_from_series(
+                service_data.get("def_diff"), offense=False
+            )
 
-        self.query_one("#off_s", Sparkline).data = service_updates.get(
-            self.service_name, {}
-        ).get("off_series")
-        self.query_one("#def_s", Sparkline).data = service_updates.get(
-            self.service_name, {}
-        ).get("def_series")
+        if service_data.get("off_series") != old_data.get("off_series"):
+            self._off_sparkline.data = service_data.get("off_series")
+        if service_data.get("def_series") != old_data.get("def_series"):
+            self._def_sparkline.data = service_data.get("def_series")